@@ -0,0 +1,139 @@
+"""
+Sparse assembly of constraint matrices from the network adjacency
+"""
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from src.geometry import as_points, as_values
+
+# node kinds
+GATEWAY = 0
+OBJECT = 1
+STATION = 2
+
+
+def node_kind(net):
+    """
+    :param net: BSS network
+    :return: array of node kinds (GATEWAY, OBJECT, STATION)
+    """
+    kind = np.full(net.node_num, STATION, dtype=np.int8)
+    kind[as_points(net.g_p)[0]] = GATEWAY
+    kind[as_points(net.o_p)[0]] = OBJECT
+    return kind
+
+
+def node_limit(net):
+    """
+    :param net: BSS network
+    :return: array of node limits: object demand, station limit, 0 for
+    the gateway
+    """
+    limit = np.zeros(net.node_num)
+    o_k = as_points(net.o_p)[0]
+    limit[o_k] = as_values(net.o_lim, o_k)
+    limit[net.s_first:] = net.station_param('limit')
+    return limit
+
+
+def candidate_arcs(net):
+    """
+    All arcs which have x variable, in the order of the x columns:
+    object2station, station2station (permutations), station2gateway
+    :param net: BSS network
+    :return: tail and head node arrays
+    """
+    g_k = as_points(net.g_p)[0]
+    o_k = as_points(net.o_p)[0]
+    s_k = as_points(net.s_p)[0]
+
+    s_s_t = np.repeat(s_k, len(s_k))
+    s_s_h = np.tile(s_k, len(s_k))
+    other = s_s_t != s_s_h
+
+    tails = np.concatenate([np.repeat(o_k, len(s_k)), s_s_t[other],
+                            np.repeat(s_k, len(g_k))])
+    heads = np.concatenate([np.tile(s_k, len(o_k)), s_s_h[other],
+                            np.tile(g_k, len(s_k))])
+    return tails, heads
+
+
+def incidence(net, variables):
+    """
+    node-arc incidence entries of flow conservation rows (row = node):
+    +1 for input arcs of gateway and stations, +1 for output arcs of objects
+    and -1 for output arcs of stations
+    :param net: BSS network
+    :param variables: VariableIndex with 'x' arc block
+    :return: rows, cols, vals arrays
+    """
+    tails, heads = net.edges()
+    columns = variables.columns('x', tails, heads)
+    out_val = np.where(node_kind(net)[tails] == OBJECT, 1, -1)
+    return (np.concatenate([heads, tails]),
+            np.concatenate([columns, columns]),
+            np.concatenate([np.ones(len(heads), dtype=int), out_val]))
+
+
+def station_input(net, variables):
+    """
+    entries of input arcs of the stations (row = station node)
+    :param net: BSS network
+    :param variables: VariableIndex with 'x' arc block
+    :return: rows, cols, vals arrays
+    """
+    tails, heads = net.edges()
+    columns = variables.columns('x', tails, heads)
+    keep = node_kind(net)[heads] == STATION
+    return heads[keep], columns[keep], np.ones(keep.sum(), dtype=int)
+
+
+def object_linking(net, variables, bound):
+    """
+    entries of x(o, s) - bound(o, s) * y(s) <= 0 rows (row from 0), one
+    per object2station arc whose bound is less than the big-M of its
+    station, so the arc is closed when the station is not placed
+    :param net: BSS network
+    :param variables: VariableIndex with 'x' arc and 'y' station blocks
+    :param bound: node throughput array (src.presolve.throughput)
+    :return: rows, cols, vals arrays, number of rows
+    """
+    tails, heads = variables.keys('x')
+    arc_bound = np.minimum(bound[tails], bound[heads])
+    on = (node_kind(net)[tails] == OBJECT) & (arc_bound < bound[heads])
+    x = variables.block('x').start + np.flatnonzero(on)
+    y = variables.columns('y', heads[on])
+    row = np.arange(len(x))
+    return (np.concatenate([row, row]), np.concatenate([x, y]),
+            np.concatenate([np.ones(len(x)), -arc_bound[on]])), len(x)
+
+
+def make_sparse(entries, shape):
+    """
+    :param entries: list of (rows, cols, vals) arrays, entries with col -1
+    (variable removed by presolve) are skipped
+    :param shape: matrix shape
+    :return: csr matrix
+    """
+    rows, cols, vals = (np.concatenate(a) for a in zip(*entries))
+    keep = cols >= 0
+    rows, cols, vals = rows[keep], cols[keep], vals[keep]
+    return sp.coo_matrix((vals, (rows, cols)), shape=shape).tocsr()
+
+
+def to_frame(matrix, columns):
+    """
+    dense DataFrame of sparse matrix, int if all values are integer
+    """
+    data = matrix.toarray()
+    if np.all(np.mod(data, 1) == 0):
+        data = data.astype(int)
+    return pd.DataFrame(data, columns=columns)
+
+
+def matrix_values(array):
+    """
+    array values for solvers: DataFrame values or the (sparse) array itself
+    """
+    return array.values if isinstance(array, pd.DataFrame) else array
@@ -0,0 +1,214 @@
+"""
+Scaling benchmark: network creation, assembly of every task and every
+available solver backend on generated instances of growing size. Wall
+time, peak memory (tracemalloc, numpy arrays included) and model
+dimensions go to a JSON report.
+
+    python -m src.benchmark --sizes 10 100 1000 --out bench.json
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from src.generator import random_instance
+from src.network import BSS
+from src.profiling import model_stats
+
+# number of objects of the instances
+SIZES = (10, 30, 100, 300, 1000, 3000, 10000)
+TASKS = ('lppfs', 'milppfs', 'milpop')
+
+
+def measure(func, *args, **kwargs):
+    """
+    :return: result of func (None if it raised), stats dict: wall_time,
+    peak_memory (bytes), error
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    result, error = None, None
+    try:
+        result = func(*args, **kwargs)
+    except Exception as exc:
+        error = '{}: {}'.format(type(exc).__name__, exc)
+    wall_time = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, {'wall_time': wall_time, 'peak_memory': peak,
+                    'error': error}
+
+
+def backends(task):
+    """
+    :return: {name: solve(problem, time_limit)} of the solvers which can
+    run here, solve returns the objective
+    """
+    from src.options import SolveOptions
+
+    def lp(method):
+        def solve(problem, time_limit):
+            from src.lp_problem import solve_lp_problem
+            return solve_lp_problem(problem.f, problem.ineq_array,
+                                    problem.ineq_b, problem.eq_array,
+                                    problem.eq_b, problem.lower_bounds,
+                                    problem.upper_bounds, method=method,
+                                    time_limit=time_limit).objective
+        return solve
+
+    def maxflow(problem, time_limit):
+        from src.flow import max_flow
+        flow = max_flow(problem.net)
+        return flow.demand - flow.value
+
+    def milp(problem, time_limit):
+        import src.highs.milp_problem
+        x = src.highs.milp_problem.solve(problem, time_limit=time_limit)
+        return float(np.ravel(problem.f) @ x)
+
+    def highspy(problem, time_limit):
+        from src.highs.model import Model
+        return Model(problem).solve(
+            options=SolveOptions(time_limit=time_limit)).objective
+
+    def gurobi(problem, time_limit):
+        import src.gurobi.milp_problem
+        x = src.gurobi.milp_problem.solve(
+            problem, options=SolveOptions(time_limit=time_limit))
+        return float(np.ravel(problem.f) @ x)
+
+    def greedy(problem, time_limit):
+        from src.task3.greedy import greedy_placement
+        placement = greedy_placement(problem.net)
+        return placement.cost if placement.feasible else None
+
+    if task == 'lppfs':
+        return {'highs-ds': lp('highs-ds'), 'highs-ipm': lp('highs-ipm'),
+                'maxflow': maxflow}
+    solvers = {'scipy-milp': milp}
+    if _importable('highspy'):
+        solvers['highspy'] = highspy
+    if _importable('gurobipy'):
+        solvers['gurobi'] = gurobi
+    if task == 'milpop':
+        solvers['greedy'] = greedy
+    return solvers
+
+
+def _importable(name):
+    try:
+        __import__(name)
+    except ImportError:
+        return False
+    return True
+
+
+def _problem_class(task):
+    if task == 'lppfs':
+        from src.task1.lppfs import LPPFS
+        return LPPFS
+    if task == 'milppfs':
+        from src.task2.milppfs import MILPPFS
+        return MILPPFS
+    from src.task3.milpop import MILPOP
+    return MILPOP
+
+
+def run_case(size, seed=0, tasks=TASKS, solvers=None, time_limit=60,
+             clusters=0, site_ratio=0.25, type_num=3):
+    """
+    benchmark of one generated instance
+    :param size: number of objects
+    :param solvers: names of the solvers to run, default - all available
+    :return: case dict: instance dimensions, 'create' stats and the stats
+    of every task (create_matrix, model size and its estimate,
+    solvers)
+    """
+    site_num = max(3, int(size * site_ratio))
+    instance = random_instance(size, site_num, type_num, clusters=clusters,
+                               seed=seed)
+    net = BSS(instance['gate'], instance['obj'], instance['sta'],
+              instance['sta_type'])
+    _, create = measure(net.create, check=False)
+    case = {'objects': size, 'sites': site_num, 'types': type_num,
+            'nodes': net.node_num,
+            'edges': int(net.adj_matrix.nnz) if net.adj_matrix is not None
+            else None,
+            'connected': (net.reachability or {}).get('connected'),
+            'create': create, 'tasks': {}}
+    if create['error']:
+        return case
+    for task in tasks:
+        problem = _problem_class(task)(net)
+        _, assembly = measure(problem.create_matrix, sparse=True,
+                              presolve=True)
+        result = {'create_matrix': assembly, 'solvers': {}}
+        case['tasks'][task] = result
+        if assembly['error']:
+            continue
+        result['model'] = model_stats(problem)
+        result['estimate'] = problem.size.as_dict()
+        for name, solve in backends(task).items():
+            if solvers is not None and name not in solvers:
+                continue
+            objective, stats = measure(solve, problem, time_limit)
+            stats['objective'] = objective
+            result['solvers'][name] = stats
+    return case
+
+
+def run_benchmark(sizes=SIZES, seed=0, tasks=TASKS, solvers=None,
+                  time_limit=60, clusters=0, path=None):
+    """
+    :param sizes: numbers of objects
+    :param seed: random seed of the instances
+    :param tasks: tasks to assemble and solve
+    :param solvers: solver names, default - all available
+    :param time_limit: solver time limit, seconds
+    :param clusters: number of object clusters, 0 - uniform objects
+    :param path: JSON report file
+    :return: report dict: environment, parameters and cases
+    """
+    report = {'python': platform.python_version(),
+              'numpy': np.__version__, 'machine': platform.machine(),
+              'seed': seed, 'time_limit': time_limit, 'clusters': clusters,
+              'cases': []}
+    for size in sizes:
+        report['cases'].append(run_case(size, seed, tasks, solvers,
+                                        time_limit, clusters))
+        if path is not None:
+            # written after every case, so a killed run keeps its numbers
+            with open(path, 'w') as file:
+                json.dump(report, file, indent=1)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--tasks', nargs='+', default=TASKS, choices=TASKS)
+    parser.add_argument('--solvers', nargs='+')
+    parser.add_argument('--time-limit', type=float, default=60)
+    parser.add_argument('--clusters', type=int, default=0)
+    parser.add_argument('--out', default='benchmark.json')
+    args = parser.parse_args(argv)
+    report = run_benchmark(args.sizes, args.seed, args.tasks, args.solvers,
+                           args.time_limit, args.clusters, args.out)
+    for case in report['cases']:
+        stages = ['create {:.3f}s'.format(case['create']['wall_time'])]
+        for task, result in case['tasks'].items():
+            stages.append('{} {:.3f}s'.format(
+                task, result['create_matrix']['wall_time']))
+            stages += ['{}/{} {:.3f}s'.format(task, name, stats['wall_time'])
+                       for name, stats in result['solvers'].items()]
+        print('{} nodes: {}'.format(case['nodes'], ', '.join(stages)))
+    return report
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
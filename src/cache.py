@@ -0,0 +1,304 @@
+"""
+Content-addressed cache of compiled models and solutions. The key is the
+hash of the canonical input data (gate, obj, sta, station types) and the
+options, entries are kept in memory (LRU) and on disk (.npz files, the
+least recently used are removed when the store is larger than its size)
+"""
+import collections
+import hashlib
+import json
+import os
+
+import numpy as np
+import scipy.sparse as sp
+
+from src.assembly import matrix_values
+from src.geometry import ArrayMap
+
+# changed when the records are changed, old entries are not used then
+VERSION = 1
+# shared caches of the process, by directory
+_caches = {}
+
+
+def canonical(value):
+    """
+    :param value: input data: dicts, lists, tuples, numbers, strings,
+    numpy arrays and ArrayMap
+    :return: the same data of JSON types, integer floats are int, so equal
+    inputs have equal keys
+    """
+    if isinstance(value, ArrayMap):
+        # arrays of a loaded instance are hashed, not listed
+        digest = hashlib.sha256()
+        for array in (value.key_array, np.asarray(value.data, dtype=float)):
+            digest.update(str(array.shape).encode())
+            digest.update(np.ascontiguousarray(array).tobytes())
+        return {'array': digest.hexdigest()}
+    if isinstance(value, dict):
+        return {str(key): canonical(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [canonical(item) for item in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def make_key(*parts):
+    """
+    :param parts: input data and options
+    :return: sha256 hex digest of the canonical JSON of the parts
+    """
+    text = json.dumps(canonical([VERSION, parts]), sort_keys=True,
+                      separators=(',', ':'))
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def run_key(task, inputs, *options):
+    """
+    key of an entry point run (lppfs_solver, milppfs_solver,
+    get_milpop_solution)
+    :param task: 'lppfs', 'milppfs' or 'milpop'
+    :param inputs: dict of gate, obj, sta and sta_type
+    :param options: options of the run, SolveOptions are keyed by their
+    values without the callback
+    :return: key
+    """
+    parts = [{name: value for name, value in vars(option).items()
+              if name != 'callback'} if hasattr(option, 'callback')
+             else option for option in options]
+    return make_key('run', task, inputs['gate'], inputs['obj'],
+                    inputs['sta'], inputs['sta_type'], *parts)
+
+
+def run_record(net, solution, y_names=None):
+    """
+    :param net: BSS network of the run
+    :param solution: solution Series of the run
+    :param y_names: names of the y solution columns
+    :return: record of the solution values and names and the network
+    edges
+    """
+    tails, heads = net.edges()
+    record = {'values': np.asarray(solution.values, dtype=float),
+              'names': np.asarray(solution.index, dtype=str),
+              'tails': tails, 'heads': heads}
+    if y_names is not None:
+        record['y_names'] = np.asarray(y_names, dtype=str)
+    return record
+
+
+def cached_network(inputs, record):
+    """
+    network of a run_record, its edges are not searched again
+    :param inputs: dict of gate, obj, sta and sta_type
+    :return: BSS
+    """
+    from src.network import BSS
+
+    net = BSS(inputs['gate'], inputs['obj'], inputs['sta'],
+              inputs['sta_type'])
+    net.prepare_sta_param()
+    net.set_edges(record['tails'], record['heads'])
+    return net
+
+
+def compile_problem(problem):
+    """
+    :param problem: LPPFS, MILPPFS or MILPOP problem after create_matrix
+    :return: record of the solver data: sparse matrices, vectors, integer
+    columns and the y columns with their station nodes
+    """
+    record = {'f': np.ravel(matrix_values(problem.f)).astype(float),
+              'ineq_array': sp.csr_matrix(matrix_values(problem.ineq_array),
+                                          dtype=float),
+              'ineq_b': np.asarray(problem.ineq_b, dtype=float),
+              'eq_array': sp.csr_matrix(matrix_values(problem.eq_array),
+                                        dtype=float),
+              'eq_b': np.asarray(problem.eq_b, dtype=float),
+              'lower_bounds': np.ravel(problem.lower_bounds).astype(float),
+              'upper_bounds': np.ravel(problem.upper_bounds).astype(float)}
+    int_constraints = getattr(problem, 'int_constraints', None)
+    if int_constraints:
+        record['int_constraints'] = np.asarray(int_constraints, dtype=int)
+    if getattr(problem, '_y_index', None) is not None:
+        record['y_index'] = np.asarray(problem._y_index, dtype=int)
+        record['y_nodes'] = np.asarray(problem.variables.keys('y')[0],
+                                       dtype=int)
+    return record
+
+
+class CompiledProblem:
+    """
+    Problem of compile_problem record, without the network: the solvers
+    (src.lp_problem, src.highs) use it as the problem itself.
+    y_nodes - station node of every y column
+    """
+    def __init__(self, record):
+        self.f = record['f'][np.newaxis, :]
+        self.ineq_array = record['ineq_array']
+        self.ineq_b = record['ineq_b']
+        self.eq_array = record['eq_array']
+        self.eq_b = record['eq_b']
+        self.lower_bounds = record['lower_bounds'][np.newaxis, :]
+        self.upper_bounds = record['upper_bounds'][np.newaxis, :]
+        self.int_constraints = (record['int_constraints'].tolist()
+                                if 'int_constraints' in record else [])
+        self._y_index = record.get('y_index')
+        self.y_nodes = record.get('y_nodes')
+
+
+def _pack(record):
+    """ record to npz arrays, a sparse matrix is saved as its csr parts """
+    arrays = {}
+    for name, value in record.items():
+        if value is None:
+            continue
+        if sp.issparse(value):
+            value = value.tocsr()
+            arrays[name + '.data'] = value.data
+            arrays[name + '.indices'] = value.indices
+            arrays[name + '.indptr'] = value.indptr
+            arrays[name + '.shape'] = np.array(value.shape)
+        else:
+            arrays[name] = np.asarray(value)
+    return arrays
+
+
+def _unpack(arrays):
+    record = {}
+    for name in arrays.files:
+        base, _, part = name.rpartition('.')
+        if not base:
+            value = arrays[name]
+            record[name] = value.item() if value.ndim == 0 else value
+        elif part == 'data':
+            record[base] = sp.csr_matrix(
+                (arrays[name], arrays[base + '.indices'],
+                 arrays[base + '.indptr']),
+                shape=tuple(arrays[base + '.shape']))
+    return record
+
+
+class Cache:
+    """
+    Two level cache of records (dicts of numpy arrays, scipy sparse
+    matrices, numbers and strings).
+    hits - {'memory': ..., 'disk': ...} found records, misses - not found
+    """
+    def __init__(self, path=None, memory_size=64, disk_size=256 * 2 ** 20):
+        """
+        :param path: directory of the disk store, None - memory only
+        :param memory_size: number of records in memory
+        :param disk_size: bytes of the disk store
+        """
+        self.path = path
+        self.memory_size = memory_size
+        self.disk_size = disk_size
+        self.memory = collections.OrderedDict()
+        self.hits = {'memory': 0, 'disk': 0}
+        self.misses = 0
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+
+    def _file(self, key):
+        return os.path.join(self.path, key + '.npz')
+
+    def get(self, key):
+        """
+        :return: record of the key or None
+        """
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            self.hits['memory'] += 1
+            return self.memory[key]
+        if self.path is not None and os.path.exists(self._file(key)):
+            try:
+                with np.load(self._file(key)) as arrays:
+                    record = _unpack(arrays)
+            except (OSError, ValueError, KeyError):
+                # broken or removed by other process
+                self.misses += 1
+                return None
+            # the access time of the file is the LRU order of the store
+            os.utime(self._file(key))
+            self.hits['disk'] += 1
+            self._remember(key, record)
+            return record
+        self.misses += 1
+        return None
+
+    def put(self, key, record):
+        """
+        keep the record in memory and save it to the disk store
+        """
+        self._remember(key, record)
+        if self.path is None:
+            return
+        # write and rename, so other processes never read a part
+        temp = os.path.join(self.path, '{}.{}.tmp.npz'.format(key,
+                                                              os.getpid()))
+        np.savez_compressed(temp, **_pack(record))
+        os.replace(temp, self._file(key))
+        self.evict()
+
+    def _remember(self, key, record):
+        self.memory[key] = record
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_size:
+            self.memory.popitem(last=False)
+
+    def disk_bytes(self):
+        if self.path is None:
+            return 0
+        return sum(entry.stat().st_size for entry in os.scandir(self.path)
+                   if entry.name.endswith('.npz'))
+
+    def evict(self):
+        """
+        remove the least recently used files until the store is not more
+        than disk_size
+        """
+        entries = [(entry.stat().st_mtime, entry.stat().st_size, entry.path)
+                   for entry in os.scandir(self.path)
+                   if entry.name.endswith('.npz') and
+                   '.tmp.' not in entry.name]
+        size = sum(entry[1] for entry in entries)
+        for _, file_size, path in sorted(entries):
+            if size <= self.disk_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            size -= file_size
+
+    def clear(self):
+        self.memory.clear()
+        if self.path is not None:
+            for entry in os.scandir(self.path):
+                if entry.name.endswith('.npz'):
+                    os.remove(entry.path)
+
+    def stats(self):
+        """
+        :return: dict of hits, misses, records in memory and bytes on disk
+        """
+        return {'memory_hits': self.hits['memory'],
+                'disk_hits': self.hits['disk'], 'misses': self.misses,
+                'memory_records': len(self.memory),
+                'disk_bytes': self.disk_bytes()}
+
+
+def get_cache(path=None):
+    """
+    :param path: directory of the disk store, None - memory only
+    :return: Cache of the path shared in the process (its memory level
+    lives between the calls)
+    """
+    path = path if path is None else os.path.abspath(path)
+    if path not in _caches:
+        _caches[path] = Cache(path)
+    return _caches[path]
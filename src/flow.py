@@ -0,0 +1,210 @@
+"""
+Max-flow feasibility of the network: can the demand of every object be
+routed through stations of limited capacity to the gateway
+"""
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.csgraph import breadth_first_order, maximum_flow
+
+from src.geometry import as_points, as_values
+
+
+class FlowResult:
+    """
+    Max-flow of the network.
+    tails, heads, flow - flow of every network arc (original node numbers),
+    source_side - bool array of nodes on the source side of the min-cut
+    (node is on the source side if its input is),
+    cut - (tail, head) arcs of the min-cut, (n, n) is the limit of object or
+    station n,
+    through - flow through every station node (s_p order),
+    near - stations with an input arc from the source side of the residual
+    graph, sink_near - stations with an output arc to a node which has a
+    residual path to the gateway: a station which is both and is not
+    placed increases the max-flow
+    """
+    def __init__(self, value, demand, tails, heads, flow, source_side, cut,
+                 through=None, near=None, sink_near=None):
+        self.value = value
+        self.demand = demand
+        self.tails = tails
+        self.heads = heads
+        self.flow = flow
+        self.source_side = source_side
+        self.cut = cut
+        self.through = through
+        self.near = near
+        self.sink_near = sink_near
+
+    @property
+    def feasible(self):
+        return self.value == self.demand
+
+    def x(self, variables):
+        """
+        :param variables: VariableIndex with 'x' arc block
+        :return: solution vector of the model, w values are 0
+        """
+        x = np.zeros(len(variables))
+        columns = variables.columns('x', self.tails, self.heads)
+        on = columns >= 0
+        x[columns[on]] = self.flow[on]
+        return x
+
+    def __repr__(self):
+        return 'FlowResult(value={}, demand={}, cut={})'.format(
+            self.value, self.demand, self.cut)
+
+
+def _integer(values, name):
+    values = np.asarray(values, dtype=float)
+    if np.any(np.mod(values[np.isfinite(values)], 1) != 0):
+        raise ValueError('Max-flow needs integer {}'.format(name))
+    return values
+
+
+class FlowNetwork:
+    """
+    Node-split max-flow network of BSS, built once: a super source sends
+    the demand of every object (capacity = object limit), every station is
+    split into input and output node (capacity = station limit) and flows
+    to the gateway. Arcs have unlimited capacity, which is the total
+    demand, as well as infinite station limits. A placement only changes
+    the capacities of the station arcs, so many placements are solved
+    without building the network again.
+    """
+    def __init__(self, net):
+        """
+        :param net: BSS network after create()
+        """
+        self.net = net
+        o_k = as_points(net.o_p)[0]
+        s_num = net.node_num - net.s_first
+        demand_o = _integer(as_values(net.o_lim, o_k), 'object limit')
+        self.demand = int(demand_o.sum())
+        limit = _integer(net.station_param('limit'), 'station limit')
+        self.limit = np.where(np.isfinite(limit), limit,
+                              self.demand).astype(np.int64)
+
+        # station s input is node s, output is node_num + s - s_first
+        self.source = net.node_num + s_num
+        self.sink = int(as_points(net.g_p)[0][0])
+        size = self.source + 1
+        self.tails, self.heads = net.edges()
+        self.arc_t = np.where(self.tails >= net.s_first,
+                              self.tails + net.node_num - net.s_first,
+                              self.tails)
+        station = np.arange(net.s_first, net.node_num)
+        self.cap_t = np.concatenate([self.arc_t, station,
+                                     np.full(len(o_k), self.source)])
+        self.cap_h = np.concatenate([self.heads, station + net.node_num -
+                                     net.s_first, o_k])
+        self.cap = np.concatenate([np.full(len(self.heads), self.demand),
+                                   self.limit, demand_o])
+        if self.cap.max(initial=0) > np.iinfo(np.int32).max:
+            raise ValueError('Max-flow capacity is out of int32 range')
+        # entries are numbered, so the station arcs are found in csr data
+        entry = sp.csr_matrix((np.arange(1, len(self.cap) + 1),
+                               (self.cap_t, self.cap_h)), shape=(size, size))
+        order = entry.data - 1
+        self.capacity = sp.csr_matrix(
+            (self.cap[order].astype(np.int32), entry.indices, entry.indptr),
+            shape=(size, size))
+        position = np.empty(len(order), dtype=np.int64)
+        position[order] = np.arange(len(order))
+        self._station_data = position[len(self.heads) + np.arange(s_num)]
+        self._arc_data = position[:len(self.heads)]
+
+    def _set(self, stations):
+        limit = self.limit if stations is None else np.where(stations,
+                                                             self.limit, 0)
+        self.capacity.data[self._station_data] = limit
+
+    def value(self, stations=None):
+        """
+        :param stations: bool array (one per station node) of the placed
+        stations, default - all stations
+        :return: max-flow value
+        """
+        self._set(stations)
+        return int(maximum_flow(self.capacity, self.source,
+                                self.sink).flow_value)
+
+    def solve(self, stations=None):
+        """
+        :param stations: bool array (one per station node) of the placed
+        stations, default - all stations
+        :return: FlowResult, arcs of the stations which are not placed have
+        no flow
+        """
+        net = self.net
+        self._set(stations)
+        res = maximum_flow(self.capacity, self.source, self.sink)
+        flow = res.flow.tocsr()
+
+        # residual graph: reached from the source (min-cut) and reaching
+        # the sink
+        residual = (self.capacity - flow).tocsr()
+        residual.data[residual.data < 0] = 0
+        residual.eliminate_zeros()
+        size = self.source + 1
+        reached = np.zeros(size, dtype=bool)
+        reached[breadth_first_order(residual, self.source,
+                                    return_predecessors=False)] = True
+        to_sink = np.zeros(size, dtype=bool)
+        to_sink[breadth_first_order(residual.T.tocsr(), self.sink,
+                                    return_predecessors=False)] = True
+        cap = self.cap.copy()
+        cap[len(self.heads):len(self.heads) + len(self.limit)] = \
+            self.capacity.data[self._station_data]
+        cut_on = reached[self.cap_t] & ~reached[self.cap_h] & (cap > 0)
+        # back to network nodes: station output is the station, source arc
+        # is the object limit
+        origin_t = np.where(self.cap_t >= net.node_num,
+                            self.cap_t - net.node_num + net.s_first,
+                            self.cap_t)
+        origin_t = np.where(self.cap_t == self.source, self.cap_h, origin_t)
+        origin_h = np.where(self.cap_h >= net.node_num,
+                            self.cap_h - net.node_num + net.s_first,
+                            self.cap_h)
+        cut = list(zip(origin_t[cut_on].tolist(), origin_h[cut_on].tolist()))
+
+        # stations next to the source side of the residual graph and
+        # stations with an arc to a node which reaches the sink
+        s_num = len(self.limit)
+        into = self.heads >= net.s_first
+        near = np.zeros(s_num, dtype=bool)
+        near[self.heads[into & reached[self.arc_t]] - net.s_first] = True
+        out = self.tails >= net.s_first
+        sink_near = np.zeros(s_num, dtype=bool)
+        sink_near[self.tails[out & to_sink[self.heads]] - net.s_first] = True
+
+        station = np.arange(net.s_first, net.node_num)
+        through = np.asarray(flow[station, station + net.node_num -
+                                  net.s_first]).ravel().astype(float)
+        tails, heads, arc_t = self.tails, self.heads, self.arc_t
+        source_side = reached[:net.node_num].copy()
+        if stations is not None:
+            # only the arcs of the placed stations
+            on = np.ones(net.node_num, dtype=bool)
+            on[net.s_first:] = stations
+            source_side &= on
+            keep = on[tails] & on[heads]
+            tails, heads, arc_t = tails[keep], heads[keep], arc_t[keep]
+        arc_flow = (np.asarray(flow[arc_t, heads]).ravel() if len(heads)
+                    else np.zeros(0))
+        return FlowResult(int(res.flow_value), self.demand, tails, heads,
+                          arc_flow.astype(float), source_side, cut, through,
+                          near, sink_near)
+
+
+def max_flow(net, stations=None):
+    """
+    Max-flow from a super source through the objects and the stations to
+    the gateway (see FlowNetwork).
+    :param net: BSS network after create()
+    :param stations: bool array (one per station node) of the placed
+    stations, default - all stations
+    :return: FlowResult
+    """
+    return FlowNetwork(net).solve(stations)
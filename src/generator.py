@@ -0,0 +1,51 @@
+"""
+Seeded synthetic instances: objects spread uniformly or in clusters over a
+square area, station places uniformly, station types with random radii
+"""
+import numpy as np
+
+from src.instance import make_instance
+
+
+def random_instance(obj_num, site_num, type_num=3, area=100.0,
+                    coverage=None, link_distance=None, demand=(10, 20),
+                    clusters=0, spread=0.05, seed=None):
+    """
+    :param obj_num: number of objects
+    :param site_num: number of station places
+    :param type_num: number of station types
+    :param area: side of the square area, the gateway is at its centre
+    :param coverage: (min, max) coverage of the types, default - 1 to 2
+    site spacings (area / sqrt(site_num))
+    :param link_distance: (min, max) link distance of the types, default -
+    1.5 to 2.5 site spacings
+    :param demand: (min, max) integer demand of an object
+    :param clusters: number of object clusters, 0 - uniform objects
+    :param spread: standard deviation of a cluster as a part of the area
+    :param seed: random seed, the same seed gives the same instance
+    :return: instance dict (see src.instance.make_instance)
+    """
+    rng = np.random.default_rng(seed)
+    spacing = area / np.sqrt(max(site_num, 1))
+    coverage = coverage or (spacing, 2 * spacing)
+    link_distance = link_distance or (1.5 * spacing, 2.5 * spacing)
+
+    if clusters:
+        centre = rng.uniform(0, area, (clusters, 2))
+        obj_pos = (centre[rng.integers(clusters, size=obj_num)] +
+                   rng.normal(0, spread * area, (obj_num, 2)))
+        obj_pos = np.clip(obj_pos, 0, area)
+    else:
+        obj_pos = rng.uniform(0, area, (obj_num, 2))
+    obj_lim = rng.integers(demand[0], demand[1] + 1, size=obj_num)
+    sta_pos = rng.uniform(0, area, (site_num, 2))
+
+    # a larger station costs more, the limit is a part of all the demand
+    cov = rng.uniform(*coverage, size=type_num)
+    link = rng.uniform(*link_distance, size=type_num)
+    limit = np.ceil(obj_lim.sum() * rng.uniform(0.5, 1, size=type_num))
+    cost = np.round(10 * (cov + link) / spacing +
+                    rng.integers(0, 10, size=type_num))
+    types = np.column_stack([limit, cov, link, cost])
+    return make_instance([[area / 2, area / 2]], obj_pos, obj_lim, sta_pos,
+                         types)
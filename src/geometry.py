@@ -0,0 +1,281 @@
+"""
+Distance based edge search between two point sets
+"""
+from collections.abc import Mapping
+
+import numpy as np
+
+# rows and columns of one distance tile
+CHUNK_SIZE = 1024
+# methods of edge search
+METHODS = ('dense', 'kdtree', 'grid')
+
+
+class ArrayMap(Mapping):
+    """
+    Read-only {node: value} view of a keys array and a data array (e.g.
+    memory-mapped): (n, 2) coordinates, map[node] is (x, y), or (n,)
+    values, map[node] is a number. as_points and as_values return the
+    arrays themselves, so a large input is not copied into dicts.
+    """
+    def __init__(self, keys, data):
+        self.key_array = np.asarray(keys, dtype=np.int64)
+        self.data = data
+        # consecutive keys (all instances of the loader) are found by
+        # subtraction, others by binary search
+        self._consecutive = bool(np.all(np.diff(self.key_array) == 1))
+        self._order = None
+
+    def index(self, keys):
+        """
+        :param keys: node keys array
+        :return: positions of the keys in the data array
+        """
+        keys = np.asarray(keys, dtype=np.int64)
+        n = len(self.key_array)
+        if self._consecutive and n:
+            index = keys - self.key_array[0]
+        else:
+            if self._order is None:
+                self._order = np.argsort(self.key_array, kind='stable')
+            index = np.searchsorted(self.key_array, keys, sorter=self._order)
+            index = self._order[np.minimum(index, max(n - 1, 0))] if n \
+                else index
+        missing = (index < 0) | (index >= n)
+        missing[~missing] |= self.key_array[index[~missing]] != keys[~missing]
+        if np.any(missing):
+            raise KeyError(int(keys[missing][0]))
+        return index
+
+    def __getitem__(self, key):
+        try:
+            i = int(self.index([key])[0])
+        except (TypeError, ValueError):
+            raise KeyError(key)
+        value = self.data[i]
+        return tuple(value.tolist()) if np.ndim(value) else value.item()
+
+    def __iter__(self):
+        return iter(self.key_array.tolist())
+
+    def __len__(self):
+        return len(self.key_array)
+
+    def __repr__(self):
+        return 'ArrayMap({} nodes)'.format(len(self))
+
+
+def as_points(position):
+    """
+    split position dict into node keys and coordinate array
+    :param position: {node: (x, y)} or ArrayMap
+    :return: keys array, (n, 2) float array of coordinates
+    """
+    if isinstance(position, ArrayMap):
+        return position.key_array, np.asarray(position.data,
+                                              dtype=float).reshape(-1, 2)
+    keys = np.fromiter(position.keys(), dtype=np.int64, count=len(position))
+    points = np.array(list(position.values()), dtype=float).reshape(-1, 2)
+    return keys, points
+
+
+def as_values(values, keys):
+    """
+    :param values: {node: value} or ArrayMap
+    :param keys: node keys array
+    :return: float array of the values of the keys
+    """
+    if isinstance(values, ArrayMap):
+        return np.asarray(values.data, dtype=float)[values.index(keys)]
+    return np.array([values[k] for k in np.asarray(keys).tolist()],
+                    dtype=float)
+
+
+def with_item(mapping, key, value):
+    """
+    :param mapping: {node: value} or ArrayMap
+    :param key: node, new or existing
+    :param value: its new value (or (x, y))
+    :return: new mapping of the same kind (the data of an ArrayMap is
+    copied into memory), the new node is the last one
+    """
+    if not isinstance(mapping, ArrayMap):
+        return {**mapping, key: value}
+    data = np.array(mapping.data)
+    if key in mapping:
+        data[mapping.index([key])[0]] = value
+        return ArrayMap(mapping.key_array, data)
+    value = np.reshape(np.asarray(value, dtype=data.dtype), data.shape[1:])
+    return ArrayMap(np.append(mapping.key_array, key),
+                    np.concatenate([data, value[np.newaxis]]))
+
+
+def without_item(mapping, key):
+    """
+    :param mapping: {node: value} or ArrayMap
+    :param key: existing node
+    :return: new mapping of the same kind without the node
+    """
+    if not isinstance(mapping, ArrayMap):
+        return {k: v for k, v in mapping.items() if k != key}
+    i = mapping.index([key])[0]
+    return ArrayMap(np.delete(mapping.key_array, i),
+                    np.delete(np.asarray(mapping.data), i, axis=0))
+
+
+def pair_edges(src, dst, radius, chunk_size=CHUNK_SIZE, exclude_self=False):
+    """
+    Find all pairs with distance(src[i], dst[j]) < radius[i].
+    Distances are computed in chunk_size x chunk_size tiles, so the memory
+    stays bounded whatever the number of points is.
+    :param src: (n, 2) array of points which own the radius
+    :param dst: (m, 2) array of points
+    :param radius: (n,) array of src radii
+    :param chunk_size: tile size
+    :param exclude_self: skip i == j pairs (src and dst are the same set)
+    :return: i, j index arrays
+    """
+    src = np.asarray(src, dtype=float).reshape(-1, 2)
+    dst = np.asarray(dst, dtype=float).reshape(-1, 2)
+    radius = np.asarray(radius, dtype=float)
+    rows, cols = [], []
+    for i0 in range(0, len(src), chunk_size):
+        block = src[i0:i0 + chunk_size]
+        r = radius[i0:i0 + chunk_size, None]
+        for j0 in range(0, len(dst), chunk_size):
+            tile = dst[j0:j0 + chunk_size]
+            dx = block[:, 0, None] - tile[None, :, 0]
+            dy = block[:, 1, None] - tile[None, :, 1]
+            mask = np.sqrt(dx ** 2 + dy ** 2) < r
+            i, j = np.nonzero(mask)
+            i += i0
+            j += j0
+            if exclude_self:
+                keep = i != j
+                i, j = i[keep], j[keep]
+            rows.append(i)
+            cols.append(j)
+    return _concat(rows, cols)
+
+
+def _concat(rows, cols):
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(rows), np.concatenate(cols)
+
+
+def distance(src, dst, i, j):
+    """
+    distance of (src[i], dst[j]) pairs, computed as in pair_edges
+    """
+    dx = src[i, 0] - dst[j, 0]
+    dy = src[i, 1] - dst[j, 1]
+    return np.sqrt(dx ** 2 + dy ** 2)
+
+
+def _filter(src, dst, radius, i, j, exclude_self):
+    """
+    keep candidate pairs which satisfy the strict distance test of pair_edges
+    """
+    keep = distance(src, dst, i, j) < radius[i]
+    if exclude_self:
+        keep &= i != j
+    return i[keep], j[keep]
+
+
+def _expand(starts, counts):
+    """
+    expand [start, start + count) ranges into owner and position arrays
+    """
+    owner = np.repeat(np.arange(len(starts)), counts)
+    shift = np.repeat(np.cumsum(counts) - counts, counts)
+    return owner, starts[owner] + np.arange(len(owner)) - shift
+
+
+def pair_edges_kdtree(src, dst, radius, exclude_self=False):
+    """
+    Same pairs as pair_edges, found by KD-tree query at the largest radius
+    and then filtered by the radius of every src point.
+    :param src: (n, 2) array of points which own the radius
+    :param dst: (m, 2) array of points
+    :param radius: (n,) array of src radii
+    :param exclude_self: skip i == j pairs (src and dst are the same set)
+    :return: i, j index arrays
+    """
+    from scipy.spatial import cKDTree
+
+    src = np.asarray(src, dtype=float).reshape(-1, 2)
+    dst = np.asarray(dst, dtype=float).reshape(-1, 2)
+    radius = np.asarray(radius, dtype=float)
+    if not len(src) or not len(dst) or radius.max() <= 0:
+        return _concat([], [])
+    # KD-tree distance may round differently, so query slightly wider
+    r_max = radius.max() * (1 + 1e-9)
+    pairs = cKDTree(src).sparse_distance_matrix(cKDTree(dst), r_max,
+                                                 output_type='ndarray')
+    i = pairs['i'].astype(np.int64)
+    j = pairs['j'].astype(np.int64)
+    return _filter(src, dst, radius, i, j, exclude_self)
+
+
+def pair_edges_grid(src, dst, radius, chunk_size=CHUNK_SIZE,
+                    exclude_self=False):
+    """
+    Same pairs as pair_edges, found in a uniform grid of cells with the side
+    equal to the largest radius: a pair can only lie in the same or in the
+    neighbour cells.
+    :param src: (n, 2) array of points which own the radius
+    :param dst: (m, 2) array of points
+    :param radius: (n,) array of src radii
+    :param chunk_size: number of src points processed at once
+    :param exclude_self: skip i == j pairs (src and dst are the same set)
+    :return: i, j index arrays
+    """
+    src = np.asarray(src, dtype=float).reshape(-1, 2)
+    dst = np.asarray(dst, dtype=float).reshape(-1, 2)
+    radius = np.asarray(radius, dtype=float)
+    if not len(src) or not len(dst) or radius.max() <= 0:
+        return _concat([], [])
+    cell = radius.max()
+    origin = np.minimum(src.min(axis=0), dst.min(axis=0))
+    dst_cell = np.floor((dst - origin) / cell).astype(np.int64)
+    src_cell = np.floor((src - origin) / cell).astype(np.int64)
+    width = max(dst_cell[:, 1].max(), src_cell[:, 1].max()) + 3
+
+    # dst points sorted by cell key
+    dst_key = (dst_cell[:, 0] + 1) * width + dst_cell[:, 1] + 1
+    order = np.argsort(dst_key, kind='stable')
+    dst_key = dst_key[order]
+
+    rows, cols = [], []
+    for i0 in range(0, len(src), chunk_size):
+        block = src_cell[i0:i0 + chunk_size]
+        for cx in (-1, 0, 1):
+            for cy in (-1, 0, 1):
+                key = (block[:, 0] + cx + 1) * width + block[:, 1] + cy + 1
+                start = np.searchsorted(dst_key, key, side='left')
+                stop = np.searchsorted(dst_key, key, side='right')
+                owner, pos = _expand(start, stop - start)
+                i, j = _filter(src, dst, radius, owner + i0, order[pos],
+                               exclude_self)
+                rows.append(i)
+                cols.append(j)
+    return _concat(rows, cols)
+
+
+def find_edges(src, dst, radius, method='dense', chunk_size=CHUNK_SIZE,
+               exclude_self=False):
+    """
+    Find all pairs with distance(src[i], dst[j]) < radius[i]
+    :param method: 'dense' - all pairs in chunked tiles,
+    'kdtree' - scipy KD-tree, 'grid' - uniform cell grid
+    :return: i, j index arrays
+    """
+    if method == 'dense':
+        return pair_edges(src, dst, radius, chunk_size, exclude_self)
+    if method == 'kdtree':
+        return pair_edges_kdtree(src, dst, radius, exclude_self)
+    if method == 'grid':
+        return pair_edges_grid(src, dst, radius, chunk_size, exclude_self)
+    raise ValueError('Unknown edge search method {!r}, expected one of {}'
+                     .format(method, METHODS))
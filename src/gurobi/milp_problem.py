@@ -1,44 +1,59 @@
 # This module uses Gurobi optimizer
+import time
 
 import gurobipy as gp
 from gurobipy import GRB
 import numpy as np
-from task3.milpop import MILPOP
+from src.task3.milpop import MILPOP
+from src.assembly import matrix_values
 
 
-def solve(problem: MILPOP):
-    """ Optimal problem """
+def solve(problem: MILPOP, start=None, options=None):
+    """
+    Optimal problem
+    :param start: solution vector used as MIP start (e.g. greedy placement)
+    :param options: SolveOptions (Gurobi parameters and incumbent callback)
+    """
     try:
         # Create a new model
         m = gp.Model("Optimal placement")
-        # print(len(problem.upper_bounds[problem.upper_bounds == 1]))
-        # print(len(problem.upper_bounds[problem.upper_bounds == float('Inf')]))
-        xvar_count = len(problem.upper_bounds[problem.upper_bounds == float('Inf')])
-        yvar_count = len(problem.upper_bounds[problem.upper_bounds == 1])
-        vtype = [GRB.CONTINUOUS] * xvar_count + [GRB.BINARY] * yvar_count
-        # x = m.addMVar(shape=xvar_count,
-        #               lb=0,
-        #               ub=GRB.INFINITY,
-        #               vtype=GRB.CONTINUOUS,
-        #               name='x')
-        # y = m.addMVar(shape=yvar_count,
-        #               lb=0,
-        #               ub=1,
-        #               vtype=GRB.BINARY,
-        #               name='y')
-        # aa = [GRB.INFINITY]
-        x = m.addMVar(shape=int(problem.f.size),
-                      lb=0.0, ub=problem.upper_bounds,
+        n = int(problem.f.size)
+        # int_constraints are MATLAB (from 1) indexes
+        vtype = np.full(n, GRB.CONTINUOUS)
+        vtype[np.asarray(problem.int_constraints, dtype=int) - 1] = \
+            GRB.BINARY
+        x = m.addMVar(shape=n,
+                      lb=0.0, ub=np.ravel(problem.upper_bounds),
                       vtype=vtype)
+        if start is not None:
+            x.Start = np.ravel(start)
         # Set objective
-        obj = problem.f.values
+        obj = np.ravel(matrix_values(problem.f))
 
         m.setObjective(obj @ x, GRB.MINIMIZE)
 
-        m.addConstr(problem.ineq_array.values @ x <= problem.ineq_b, name="inequality")
-        m.addConstr(problem.eq_array.values @ x == problem.eq_b, name="equality")
+        m.addConstr(matrix_values(problem.ineq_array) @ x <= problem.ineq_b,
+                    name="inequality")
+        m.addConstr(matrix_values(problem.eq_array) @ x == problem.eq_b,
+                    name="equality")
+        callback = None
+        if options is not None:
+            for name, value in options.gurobi().items():
+                m.setParam(name, value)
+            if options.callback is not None:
+                begin = time.monotonic()
+                variables = x.tolist()
+
+                def callback(model, where):
+                    if where != GRB.Callback.MIPSOL:
+                        return
+                    if options.incumbent(
+                            begin, model.cbGet(GRB.Callback.MIPSOL_OBJ),
+                            model.cbGet(GRB.Callback.MIPSOL_OBJBND),
+                            np.array(model.cbGetSolution(variables))):
+                        model.terminate()
         # Optimize model
-        m.optimize()
+        m.optimize(callback)
 
         print(x.X)
 
@@ -0,0 +1,78 @@
+"""
+Solve MILP problem with HiGHS (scipy.optimize.milp), no license or
+external engine is needed
+"""
+import copy
+
+import numpy as np
+import scipy.sparse as sp
+from scipy.optimize import milp, LinearConstraint, Bounds
+
+from src.assembly import matrix_values
+
+
+def make_constraints(problem):
+    """
+    :param problem: task problem with ineq_array, ineq_b, eq_array, eq_b
+    :return: list of LinearConstraint
+    """
+    constraints = []
+    ineq = sp.csr_matrix(matrix_values(problem.ineq_array), dtype=float)
+    if ineq.shape[0]:
+        constraints.append(LinearConstraint(ineq, -np.inf, problem.ineq_b))
+    eq = sp.csr_matrix(matrix_values(problem.eq_array), dtype=float)
+    if eq.shape[0]:
+        constraints.append(LinearConstraint(eq, problem.eq_b, problem.eq_b))
+    return constraints
+
+
+def solve(problem, option='optimization', time_limit=None, options=None):
+    """
+    :param problem: MILPOP or MILPPFS problem after create_matrix
+    :param option: default - optimization problem (f->min) or feasible
+    solution (f==0)
+    :param time_limit: solver time limit, seconds (the best solution found
+    is returned)
+    :param options: SolveOptions, the problem is solved by the highspy
+    Model then (all options and the incumbent callback)
+    :return: solution vector, integer variables are rounded
+    """
+    if options is not None:
+        from src.highs.model import Model
+
+        if time_limit is not None and options.time_limit is None:
+            options = copy.copy(options)
+            options.time_limit = time_limit
+        model = Model(problem)
+        result = model.solve(options=options)
+        assert result.x is not None, \
+            'There is no solution of MILP problem: {}'.format(result.status)
+        if option == 'feasible_solution':
+            assert round(result.objective) == 0, (
+                'There is no solution because the objective function value '
+                'of integer linear programing problem is not zero')
+        x = result.x.copy()
+        x[model.int_index] = np.round(x[model.int_index])
+        return x
+
+    f = np.ravel(matrix_values(problem.f)).astype(float)
+    # int_constraints are MATLAB (from 1) indexes
+    int_index = np.asarray(problem.int_constraints, dtype=int) - 1
+    integrality = np.zeros(len(f))
+    integrality[int_index] = 1
+    bounds = Bounds(np.ravel(problem.lower_bounds).astype(float),
+                    np.ravel(problem.upper_bounds).astype(float))
+
+    options = {} if time_limit is None else {'time_limit': time_limit}
+    res = milp(f, integrality=integrality, bounds=bounds,
+               constraints=make_constraints(problem), options=options)
+    assert res.x is not None, \
+        'There is no solution of MILP problem: {}'.format(res.message)
+    x = res.x
+    x[int_index] = np.round(x[int_index])
+
+    if option == 'feasible_solution':
+        assert round(res.fun) == 0, ('There is no solution because the '
+                                     'objective function value of integer '
+                                     'linear programing problem is not zero')
+    return x
@@ -0,0 +1,314 @@
+"""
+Persistent HiGHS model: the constraint matrix is compiled once, then only
+the objective and the right hand side are changed between solutions
+"""
+import time
+
+import numpy as np
+import scipy.sparse as sp
+from scipy.optimize import milp, LinearConstraint, Bounds
+
+from src.assembly import matrix_values
+from src.geometry import as_points, as_values
+from src.options import SolveOptions
+
+
+class ModelResult:
+    """
+    Result of one solution of Model.
+    status - HiGHS model status name (e.g. 'kOptimal', 'kInfeasible'),
+    warm - previous incumbent or basis was used,
+    saved - wall time saved against the last cold solution
+    """
+    def __init__(self, status, objective, x, wall_time, warm, saved):
+        self.status = status
+        self.objective = objective
+        self.x = x
+        self.wall_time = wall_time
+        self.warm = warm
+        self.saved = saved
+
+    @property
+    def success(self):
+        return self.status == 'kOptimal'
+
+    def __repr__(self):
+        return ('ModelResult(status={}, objective={}, wall_time={:.4f}, '
+                'warm={}, saved={})'.format(self.status, self.objective,
+                                            self.wall_time, self.warm,
+                                            self.saved))
+
+
+class BatchResult:
+    """
+    Results of solve_demands, one per demand vector.
+    objective - objective values (nan if there is no solution),
+    placed - bool (K, y number) array of placed stations (y = 1),
+    status - HiGHS model status names
+    """
+    def __init__(self, size, y_num):
+        self.objective = np.full(size, np.nan)
+        self.placed = np.zeros((size, y_num), dtype=bool)
+        self.status = []
+        self.wall_time = np.zeros(size)
+
+    def __repr__(self):
+        return 'BatchResult(objective={}, wall_time={:.4f})'.format(
+            self.objective, self.wall_time.sum())
+
+
+class Model:
+    """
+    Compiled model of LPPFS, MILPPFS or MILPOP problem.
+    Rows are the inequality rows and then the equality rows of the problem.
+    A MILP is warm started from the integer values of the previous
+    incumbent (HiGHS completes the continuous ones), a LP is re-solved from
+    the previous basis, which HiGHS keeps while only costs and bounds are
+    changed. Without highspy every solution is a cold scipy milp solution.
+    """
+    def __init__(self, problem):
+        self.problem = problem
+        self.f = np.ravel(matrix_values(problem.f)).astype(float)
+        self.lb = np.ravel(problem.lower_bounds).astype(float)
+        self.ub = np.ravel(problem.upper_bounds).astype(float)
+        self.int_index = np.asarray(
+            getattr(problem, 'int_constraints', None) or [], dtype=int) - 1
+        ineq = sp.csr_matrix(matrix_values(problem.ineq_array), dtype=float)
+        eq = sp.csr_matrix(matrix_values(problem.eq_array), dtype=float)
+        self.ineq_num = ineq.shape[0]
+        self.matrix = sp.vstack([ineq, eq]).tocsc()
+        self.row_lower = np.concatenate([np.full(self.ineq_num, -np.inf),
+                                         problem.eq_b]).astype(float)
+        self.row_upper = np.concatenate([problem.ineq_b,
+                                         problem.eq_b]).astype(float)
+
+        self.x = None
+        self.cold_time = None
+        self._highs = self._compile()
+
+    def _compile(self):
+        try:
+            import highspy
+        except ImportError:
+            return None
+        lp = highspy.HighsLp()
+        lp.num_col_, lp.num_row_ = len(self.f), self.matrix.shape[0]
+        lp.col_cost_ = self.f
+        lp.col_lower_ = self.lb
+        lp.col_upper_ = self.ub
+        lp.row_lower_ = self.row_lower
+        lp.row_upper_ = self.row_upper
+        lp.a_matrix_.format_ = highspy.MatrixFormat.kColwise
+        lp.a_matrix_.start_ = self.matrix.indptr
+        lp.a_matrix_.index_ = self.matrix.indices
+        lp.a_matrix_.value_ = self.matrix.data
+        if len(self.int_index):
+            integrality = [highspy.HighsVarType.kContinuous] * len(self.f)
+            for i in self.int_index.tolist():
+                integrality[i] = highspy.HighsVarType.kInteger
+            lp.integrality_ = integrality
+        h = highspy.Highs()
+        h.setOptionValue('output_flag', False)
+        h.passModel(lp)
+        return h
+
+    def set_start(self, x):
+        """
+        :param x: solution vector to warm start the next solution from
+        (e.g. greedy placement)
+        """
+        self.x = np.array(x, dtype=float)
+
+    def set_objective(self, f):
+        """
+        :param f: new objective function vector
+        """
+        f = np.ravel(f).astype(float)
+        changed = np.flatnonzero(f != self.f)
+        self.f = f
+        if self._highs is not None and len(changed):
+            self._highs.changeColsCost(len(changed), changed.astype(np.int32),
+                                       f[changed])
+
+    def set_rhs(self, eq_b=None, ineq_b=None):
+        """
+        :param eq_b: new linear equality constraint vector
+        :param ineq_b: new linear inequality constraint vector
+        """
+        lower, upper = self.row_lower.copy(), self.row_upper.copy()
+        if ineq_b is not None:
+            upper[:self.ineq_num] = ineq_b
+        if eq_b is not None:
+            lower[self.ineq_num:] = eq_b
+            upper[self.ineq_num:] = eq_b
+        changed = np.flatnonzero((lower != self.row_lower) |
+                                 (upper != self.row_upper))
+        self.row_lower, self.row_upper = lower, upper
+        if self._highs is not None and len(changed):
+            self._highs.changeRowsBounds(len(changed),
+                                         changed.astype(np.int32),
+                                         lower[changed], upper[changed])
+
+    def cost_vector(self, sta_type):
+        """
+        objective function of new station type costs
+        :param sta_type: {type: {'cost': cost, ...}}
+        :return: f vector
+        """
+        net = self.problem.net
+        report = self.problem.presolve_report or {}
+        if report.get('dominated_stations'):
+            raise ValueError('Stations {} were removed as dominated for the '
+                             'old costs, build the model again for new '
+                             'costs'.format(report['dominated_stations']))
+        f = self.f.copy()
+        y = self.problem.variables.block('y')
+        node = self.problem.variables.keys('y')[0]
+        types = (node - net.s_first) // net.site_num + 1
+        f[y] = [sta_type[t]['cost'] for t in types.tolist()]
+        return f
+
+    def demand_rhs(self, o_lim):
+        """
+        equality vector of new object demands: object row gets its demand,
+        gateway row the demand of all objects
+        :param o_lim: {object: demand}
+        :return: eq_b vector
+        """
+        o_k = as_points(self.problem.net.o_p)[0]
+        return self.demand_matrix([as_values(o_lim, o_k)])[0]
+
+    def demand_matrix(self, demands):
+        """
+        equality vectors of many demand scenarios
+        :param demands: (K, object number) array, objects in the order of
+        net.o_p
+        :return: (K, equality row number) array of eq_b vectors
+        :raise ValueError: the model was tightened, its bounds of x are the
+        throughputs of the old demand
+        """
+        net = self.problem.net
+        if getattr(self.problem, '_throughput', None) is not None:
+            raise ValueError('The bounds of x were tightened for the old '
+                             'demand, build the model again for new demands')
+        demands = np.atleast_2d(np.asarray(demands, dtype=float))
+        eq_rows = self.problem.eq_rows
+        eq_b = np.tile(self.row_lower[self.ineq_num:], (len(demands), 1))
+        for nodes, values in ((as_points(net.o_p)[0], demands),
+                              (as_points(net.g_p)[0],
+                               demands.sum(axis=1, keepdims=True))):
+            pos = np.minimum(np.searchsorted(eq_rows, nodes),
+                             len(eq_rows) - 1)
+            found = eq_rows[pos] == nodes
+            values = np.broadcast_to(values, (len(demands), len(nodes)))
+            dropped = ~found & np.any(values != 0, axis=0)
+            if np.any(dropped):
+                raise ValueError('Rows {} were dropped by presolve, build the '
+                                 'model again for this demand'
+                                 .format(nodes[dropped].tolist()))
+            eq_b[:, pos[found]] = values[:, found]
+        return eq_b
+
+    def solve_demands(self, demands, warm=True):
+        """
+        Solve the model for every demand vector, only the right hand side
+        is changed between the solutions, so the matrix, the basis (LP) or
+        the incumbent (MILP) of the previous solution are used again
+        :param demands: (K, object number) array, objects in the order of
+        net.o_p
+        :param warm: warm start every solution from the previous one
+        :return: BatchResult
+        """
+        eq_b = self.demand_matrix(demands)
+        y = (self.problem.variables.block('y')
+             if 'y' in self.problem.variables.blocks else slice(0, 0))
+        batch = BatchResult(len(eq_b), y.stop - y.start)
+        for k, b in enumerate(eq_b):
+            self.set_rhs(eq_b=b)
+            result = self.solve(warm=warm)
+            batch.status.append(result.status)
+            batch.wall_time[k] = result.wall_time
+            if result.x is not None and result.success:
+                batch.objective[k] = result.objective
+                batch.placed[k] = result.x[y] > 0.5
+        return batch
+
+    def solve(self, warm=True, options=None):
+        """
+        :param warm: start from the previous solution, otherwise solve
+        from scratch
+        :param options: SolveOptions (without highspy: only time limit,
+        relative gap and node limit, no callback)
+        :return: ModelResult
+        """
+        warm = warm and self.x is not None and self._highs is not None
+        options = options or SolveOptions()
+        start = time.perf_counter()
+        if self._highs is None:
+            status, objective, x = self._solve_scipy(options)
+        else:
+            status, objective, x = self._solve_highs(warm, options)
+        wall_time = time.perf_counter() - start
+
+        if x is not None:
+            x[self.int_index] = np.round(x[self.int_index])
+            self.x = x
+        saved = None
+        if not warm:
+            self.cold_time = wall_time
+        elif self.cold_time is not None:
+            saved = self.cold_time - wall_time
+        return ModelResult(status, objective, x, wall_time, warm, saved)
+
+    def _solve_highs(self, warm, options):
+        h = self._highs
+        h.resetOptions()
+        h.setOptionValue('output_flag', False)
+        for name, value in options.highs().items():
+            h.setOptionValue(name, value)
+        if not warm:
+            h.clearSolver()
+        elif len(self.int_index):
+            index = self.int_index.astype(np.int32)
+            h.setSolution(len(index), index, self.x[index])
+
+        start = time.monotonic()
+        stop = []
+
+        def improved(event):
+            data = event.data_out
+            if options.incumbent(start, data.objective_function_value,
+                                 data.mip_dual_bound,
+                                 np.array(data.mip_solution)):
+                stop.append(True)
+
+        def interrupt(event):
+            if stop:
+                event.interrupt()
+
+        if options.callback is not None:
+            h.cbMipImprovingSolution.subscribe(improved)
+            h.cbMipInterrupt.subscribe(interrupt)
+        try:
+            h.run()
+        finally:
+            if options.callback is not None:
+                h.cbMipImprovingSolution.unsubscribe(improved)
+                h.cbMipInterrupt.unsubscribe(interrupt)
+        status = h.getModelStatus().name
+        if h.getInfo().primal_solution_status == 0:
+            return status, None, None
+        x = np.array(h.getSolution().col_value)
+        return status, h.getInfo().objective_function_value, x
+
+    def _solve_scipy(self, options):
+        integrality = np.zeros(len(self.f))
+        integrality[self.int_index] = 1
+        res = milp(self.f, integrality=integrality,
+                   bounds=Bounds(self.lb, self.ub),
+                   constraints=[LinearConstraint(self.matrix, self.row_lower,
+                                                 self.row_upper)],
+                   options=options.scipy())
+        status = {0: 'kOptimal', 1: 'kTimeLimit', 2: 'kInfeasible',
+                  3: 'kUnbounded'}.get(res.status, res.message)
+        return status, res.fun, res.x
@@ -0,0 +1,213 @@
+"""
+Instance files: gateway, objects, station places and station types of a
+problem in JSON, CSV or NumPy files. Coordinates and limits are kept as
+arrays (memory-mapped from a .npy directory or an uncompressed .npz) and
+BSS gets them as ArrayMap, so no dict of points is built.
+Nodes are numbered in the file order as in problem/*_input.py: the
+gateway is 0, objects are 1, 2, ..., station places and types are
+numbered from 1.
+"""
+import json
+import os
+import struct
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+from src.geometry import ArrayMap, as_points, as_values
+
+# columns of the station type array
+TYPE_FIELDS = ('limit', 'coverage', 'link_distance', 'cost')
+# arrays of .npz and .npy instances
+ARRAYS = ('gate_pos', 'gate_lim', 'obj_pos', 'obj_lim', 'sta_pos', 'types')
+
+
+def make_instance(gate_pos, obj_pos, obj_lim, sta_pos, types, gate_lim=None):
+    """
+    :param gate_pos: (1, 2) coordinates of the gateway
+    :param obj_pos: (n, 2) coordinates of the objects
+    :param obj_lim: (n,) demands of the objects
+    :param sta_pos: (m, 2) coordinates of the station places
+    :param types: (T, 4) station types, columns as TYPE_FIELDS
+    :param gate_lim: gateway limit, default - inf
+    :return: instance dict: gate, obj, sta, sta_type (as the input modules)
+    """
+    gate_pos = np.reshape(gate_pos, (-1, 2))
+    if gate_lim is None:
+        gate_lim = np.full(len(gate_pos), np.inf)
+    gate_key = np.arange(len(gate_pos))
+    obj_key = np.arange(len(obj_pos)) + len(gate_pos)
+    types = np.reshape(types, (-1, len(TYPE_FIELDS)))
+    return {'gate': {'pos': ArrayMap(gate_key, gate_pos),
+                     'lim': ArrayMap(gate_key, np.ravel(gate_lim))},
+            'obj': {'pos': ArrayMap(obj_key, obj_pos),
+                    'lim': ArrayMap(obj_key, obj_lim)},
+            'sta': {'pos': ArrayMap(np.arange(len(sta_pos)) + 1, sta_pos)},
+            'sta_type': {t + 1: {name: row[i].item()
+                                 for i, name in enumerate(TYPE_FIELDS)}
+                         for t, row in enumerate(types)}}
+
+
+def instance_arrays(instance):
+    """
+    :param instance: instance dict (loaded or of the input modules)
+    :return: dict of ARRAYS
+    """
+    g_k, gate_pos = as_points(instance['gate']['pos'])
+    o_k, obj_pos = as_points(instance['obj']['pos'])
+    gate_lim = instance['gate'].get('lim')
+    sta_type = instance['sta_type']
+    return {'gate_pos': gate_pos,
+            'gate_lim': (as_values(gate_lim, g_k) if gate_lim
+                         else np.full(len(g_k), np.inf)),
+            'obj_pos': obj_pos,
+            'obj_lim': as_values(instance['obj']['lim'], o_k),
+            'sta_pos': as_points(instance['sta']['pos'])[1],
+            'types': np.array([[sta_type[t][name] for name in TYPE_FIELDS]
+                               for t in sorted(sta_type)], dtype=float)}
+
+
+def _from_arrays(arrays):
+    return make_instance(arrays['gate_pos'], arrays['obj_pos'],
+                         arrays['obj_lim'], arrays['sta_pos'],
+                         arrays['types'], arrays.get('gate_lim'))
+
+
+def _npz_arrays(path, mmap):
+    """
+    arrays of .npz file, stored (not compressed) members are
+    memory-mapped at their offset in the file
+    """
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, 'rb') as file:
+        for info in archive.infolist():
+            name = info.filename[:-len('.npy')]
+            if not mmap or info.compress_type != zipfile.ZIP_STORED:
+                with archive.open(info) as member:
+                    arrays[name] = np.lib.format.read_array(member)
+                continue
+            # local file header: 30 bytes, name and extra field
+            file.seek(info.header_offset + 26)
+            name_len, extra_len = struct.unpack('<HH', file.read(4))
+            file.seek(info.header_offset + 30 + name_len + extra_len)
+            version = np.lib.format.read_magic(file)
+            read_header = (np.lib.format.read_array_header_1_0
+                           if version == (1, 0)
+                           else np.lib.format.read_array_header_2_0)
+            shape, fortran, dtype = read_header(file)
+            if not np.prod(shape):
+                arrays[name] = np.empty(shape, dtype=dtype)
+                continue
+            arrays[name] = np.memmap(path, dtype=dtype, mode='r',
+                                     offset=file.tell(), shape=shape,
+                                     order='F' if fortran else 'C')
+    return arrays
+
+
+def _npy_arrays(path, mmap):
+    arrays = {}
+    for name in ARRAYS:
+        file = os.path.join(path, name + '.npy')
+        if os.path.exists(file):
+            arrays[name] = np.load(file, mmap_mode='r' if mmap else None)
+    return arrays
+
+
+def _json_arrays(path):
+    with open(path) as file:
+        data = json.load(file)
+    sta_type = data['sta_type']
+    if isinstance(sta_type, dict):
+        sta_type = [sta_type[t] for t in sorted(sta_type, key=int)]
+    gate = data.get('gate', {})
+    if 'pos' not in gate:
+        raise ValueError('Instance file {!r} has no gateway positions '
+                         '(gate.pos)'.format(path))
+    return {'gate_pos': np.array(gate['pos'], dtype=float),
+            'gate_lim': (np.array(gate['lim'], dtype=float)
+                         if 'lim' in gate else None),
+            'obj_pos': np.array(data['obj']['pos'], dtype=float),
+            'obj_lim': np.array(data['obj']['lim'], dtype=float),
+            'sta_pos': np.array(data['sta']['pos'], dtype=float),
+            'types': np.array([[t[name] for name in TYPE_FIELDS]
+                               for t in sta_type], dtype=float)}
+
+
+def _csv_arrays(path):
+    """
+    CSV rows: kind ('gate', 'obj', 'sta' or 'type'), x, y, lim of the
+    points and TYPE_FIELDS of the types
+    """
+    table = pd.read_csv(path)
+    kind = table['kind'].to_numpy()
+
+    def rows(name, columns):
+        return table.loc[kind == name, list(columns)].to_numpy(dtype=float)
+
+    gate_lim = rows('gate', ['lim'])[:, 0]
+    return {'gate_pos': rows('gate', ['x', 'y']),
+            'gate_lim': np.where(np.isnan(gate_lim), np.inf, gate_lim),
+            'obj_pos': rows('obj', ['x', 'y']),
+            'obj_lim': rows('obj', ['lim'])[:, 0],
+            'sta_pos': rows('sta', ['x', 'y']),
+            'types': rows('type', TYPE_FIELDS)}
+
+
+def load_instance(path, mmap=True):
+    """
+    :param path: .json, .csv, .npz file or a directory of .npy files
+    (ARRAYS names)
+    :param mmap: memory-map the arrays of .npy and uncompressed .npz
+    :return: instance dict: gate, obj, sta, sta_type, usable as
+    BSS(instance['gate'], instance['obj'], instance['sta'],
+    instance['sta_type'])
+    """
+    if os.path.isdir(path):
+        return _from_arrays(_npy_arrays(path, mmap))
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.npz':
+        return _from_arrays(_npz_arrays(path, mmap))
+    if extension == '.json':
+        return _from_arrays(_json_arrays(path))
+    if extension == '.csv':
+        return _from_arrays(_csv_arrays(path))
+    raise ValueError('Unknown instance file {!r}, expected .json, .csv, '
+                     '.npz or a directory of .npy files'.format(path))
+
+
+def save_instance(path, instance):
+    """
+    :param path: .json, .csv, .npz (not compressed, so it can be
+    memory-mapped) file or a directory for .npy files
+    :param instance: instance dict (loaded or of the input modules), nodes
+    are renumbered in their order
+    """
+    arrays = instance_arrays(instance)
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.npz':
+        np.savez(path, **arrays)
+    elif extension == '.json':
+        with open(path, 'w') as file:
+            json.dump({'gate': {'pos': arrays['gate_pos'].tolist(),
+                                'lim': arrays['gate_lim'].tolist()},
+                       'obj': {'pos': arrays['obj_pos'].tolist(),
+                               'lim': arrays['obj_lim'].tolist()},
+                       'sta': {'pos': arrays['sta_pos'].tolist()},
+                       'sta_type': [dict(zip(TYPE_FIELDS, row))
+                                    for row in arrays['types'].tolist()]},
+                      file)
+    elif extension == '.csv':
+        parts = [pd.DataFrame({'kind': kind, 'x': pos[:, 0],
+                               'y': pos[:, 1], 'lim': lim})
+                 for kind, pos, lim in
+                 (('gate', arrays['gate_pos'], arrays['gate_lim']),
+                  ('obj', arrays['obj_pos'], arrays['obj_lim']),
+                  ('sta', arrays['sta_pos'], np.nan))]
+        types = pd.DataFrame(arrays['types'], columns=TYPE_FIELDS)
+        types.insert(0, 'kind', 'type')
+        pd.concat(parts + [types]).to_csv(path, index=False)
+    else:
+        os.makedirs(path, exist_ok=True)
+        for name, array in arrays.items():
+            np.save(os.path.join(path, name + '.npy'), array)
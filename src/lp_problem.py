@@ -1,29 +1,81 @@
+import time
+
 from scipy.optimize import linprog
+import scipy.sparse as sp
 import numpy as np
 
 
-def solve_lp_problem(obj_func, ineq_array, ineq_b, eq_array, eq_b, lb, ub):
+class LPResult:
+    """
+    Result of linear programming problem
+    status: 0 - optimal, 1 - iteration or time limit, 2 - infeasible,
+    3 - unbounded, 4 - numerical difficulties (scipy linprog status)
+    """
+    def __init__(self, res, wall_time):
+        self.status = res.status
+        self.message = res.message
+        self.objective = res.fun
+        self.x = res.x
+        self.iterations = res.nit
+        self.wall_time = wall_time
+        # dual values (marginals) of the constraints and bounds
+        self.duals = {name: getattr(res, name).marginals
+                      for name in ('eqlin', 'ineqlin', 'lower', 'upper')
+                      if getattr(res, name, None) is not None}
+
+    @property
+    def success(self):
+        return self.status == 0
+
+    @property
+    def feasible(self):
+        """
+        feasible solution problem (f = sum of artificial values) has
+        a solution: LP is solved and the objective function value is zero
+        """
+        return self.success and round(self.objective) == 0
+
+    def __repr__(self):
+        return ('LPResult(status={}, objective={}, iterations={}, '
+                'wall_time={:.4f})'.format(self.status, self.objective,
+                                           self.iterations, self.wall_time))
+
+
+def solve_lp_problem(obj_func, ineq_array, ineq_b, eq_array, eq_b, lb, ub,
+                     method='highs-ds', disp=False, time_limit=None,
+                     options=None):
     """
-    Simplex Method solution
+    HiGHS solution of linear programming problem
     :param obj_func: objective function (f = 0, feasible solution)
-    :param ineq_array: inequality matrix
+    :param ineq_array: inequality matrix (dense or scipy sparse)
     :param ineq_b: linear inequality constraint vector
-    :param eq_array: equality matrix
+    :param eq_array: equality matrix (dense or scipy sparse)
     :param eq_b: linear equality constraint vector
     :param lb: lower bound
     :param ub: upper bound
-    :return: result
+    :param method: 'highs-ds' (dual simplex), 'highs-ipm' (interior point)
+    or 'highs' (HiGHS chooses)
+    :param disp: print solver log
+    :param time_limit: solver time limit, seconds
+    :param options: SolveOptions, only the time limit is used by linprog
+    :return: LPResult
     """
-    b_array = np.vstack([lb, ub])
-    minmax_bounds = tuple((b_array[0, i], b_array[1, i])
-                          for i in range(len(b_array[0])))
-
-    res = linprog(obj_func, A_ub=ineq_array, b_ub=ineq_b,
-                  A_eq=eq_array, b_eq=eq_b, bounds=minmax_bounds,
-                  method='simplex', callback=None,
-                  options={'disp': True})
-    assert round(res.fun) == 0, \
-        ('There is no solution because the '
-         'objective function value of linear '
-         'programing problem is not zero')
-    return res
\ No newline at end of file
+    bounds = np.column_stack([np.ravel(lb), np.ravel(ub)]).astype(float)
+    ineq_array = sp.csr_matrix(ineq_array, dtype=float)
+    eq_array = sp.csr_matrix(eq_array, dtype=float)
+
+    solver_options = {'disp': disp}
+    if options is not None:
+        solver_options.update(options.scipy(mip=False))
+    if time_limit is not None:
+        solver_options['time_limit'] = time_limit
+
+    start = time.perf_counter()
+    res = linprog(np.ravel(obj_func),
+                  A_ub=ineq_array if ineq_array.shape[0] else None,
+                  b_ub=ineq_b if ineq_array.shape[0] else None,
+                  A_eq=eq_array if eq_array.shape[0] else None,
+                  b_eq=eq_b if eq_array.shape[0] else None,
+                  bounds=bounds, method=method,
+                  options=solver_options)
+    return LPResult(res, time.perf_counter() - start)
@@ -1,4 +1,4 @@
-function [x,fval, exitflag, output] = milp(f,intcon,A,b,Aeq,beq,lb,ub)
+function [x,fval, exitflag, output] = milp(f,intcon,A,b,Aeq,beq,lb,ub,opts)
 load(f)
 load(intcon)
 load(A)
@@ -17,4 +17,12 @@ beq = double(beq);
 lb = double(lb);
 ub = double(ub);
 
-[x,fval, exitflag, output] = intlinprog(f,intcon,A,b,Aeq,beq,lb,ub)
\ No newline at end of file
+options = optimoptions('intlinprog');
+if nargin > 8
+    names = fieldnames(opts);
+    for i = 1:numel(names)
+        options.(names{i}) = opts.(names{i});
+    end
+end
+
+[x,fval, exitflag, output] = intlinprog(f,intcon,A,b,Aeq,beq,lb,ub,options)
\ No newline at end of file
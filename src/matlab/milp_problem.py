@@ -2,6 +2,7 @@
 call MatLAB engine from Python to src MILP problem
 """
 import os
+import time
 # import matlab.engine
 import scipy.io
 import itertools
@@ -20,7 +21,7 @@ def save_mfile(path, array, name):
 
 
 def solve(f, intcon, A, b, Aeq, beq, lb, ub, option='optimization',
-          path='../src/matlab/matfiles/'):
+          path='../src/matlab/matfiles/', options=None):
     """
     call m-file with solver function
     :param path: it is path to save .m-file
@@ -35,6 +36,8 @@ def solve(f, intcon, A, b, Aeq, beq, lb, ub, option='optimization',
     :param option: default - optimization problem (f->min) or feasible solution
     (f==0)
     :param path: path to m.-files
+    :param options: SolveOptions, intlinprog has no incumbent callback in
+    the engine, the callback gets the final solution only
     :return: solution of ILP problem
     """
     f = save_mfile(path, f, name='f')
@@ -49,9 +52,17 @@ def solve(f, intcon, A, b, Aeq, beq, lb, ub, option='optimization',
     eng = matlab.engine.start_matlab()
     eng.cd(r'../src/matlab/', nargout=0)
 
+    opts = {}
+    if options is not None:
+        opts = {key: float(value)
+                for key, value in options.matlab().items()}
+    start = time.monotonic()
     [x, fval, exitflag, output] = eng.milp(f, intcon, A, b, Aeq, beq,
-                                           lb, ub, nargout=4)
+                                           lb, ub, opts, nargout=4)
     out_x = [round(i) for i in list(itertools.chain(*x))]
+    if options is not None:
+        options.incumbent(start, fval, fval - output['absolutegap'],
+                          out_x)
 
     if option == 'feasible_solution':
         assert round(fval) == 0, ('There is no solution because the '
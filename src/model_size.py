@@ -0,0 +1,164 @@
+"""
+Model size before assembly: columns, rows, nonzeros and memory of a task
+model from the node and edge counts of the network, and the memory guard
+of create_matrix
+"""
+import os
+import warnings
+
+import numpy as np
+
+from src.assembly import node_kind, OBJECT, STATION
+
+# bytes of a column: arc keys and codes of VariableIndex, candidate arc
+# temporaries, f, lower and upper bounds
+COLUMN_BYTES = 64
+# bytes of a nonzero: rows, cols, vals of the entries and the csr matrix
+ENTRY_BYTES = 36
+# bytes of a dense cell: float array and its int copy (to_frame)
+CELL_BYTES = 16
+# memory budget of create_matrix in bytes, None - half of the physical
+# memory
+MEMORY_BUDGET = None
+
+
+class ModelTooLargeError(MemoryError):
+    """
+    The sparse model does not fit the memory budget either.
+    """
+    def __init__(self, size, budget):
+        self.size = size
+        self.budget = budget
+        super().__init__('The {} model needs about {:.0f} MB, the memory '
+                         'budget is {:.0f} MB: {}'.format(
+                             size.task, size.sparse_bytes / 2 ** 20,
+                             budget / 2 ** 20, size))
+
+
+class ModelSize:
+    """
+    Estimated size of a task model. With presolve all network arcs and
+    stations are counted (presolve keeps a part of them), so the numbers
+    are upper bounds then.
+    """
+    def __init__(self, task, columns, x, eq_rows, ineq_rows, nonzeros,
+                 integers):
+        self.task = task
+        self.columns = columns
+        self.x = x
+        self.eq_rows = eq_rows
+        self.ineq_rows = ineq_rows
+        self.nonzeros = nonzeros
+        self.integers = integers
+
+    @property
+    def rows(self):
+        return self.eq_rows + self.ineq_rows
+
+    @property
+    def sparse_bytes(self):
+        """ memory of the sparse assembly """
+        return (self.columns * COLUMN_BYTES + self.nonzeros * ENTRY_BYTES +
+                self.rows * 3 * 8)
+
+    @property
+    def dense_bytes(self):
+        """ memory of the sparse assembly and the dense matrices """
+        return self.sparse_bytes + self.rows * self.columns * CELL_BYTES
+
+    def as_dict(self):
+        return {'task': self.task, 'columns': self.columns, 'x': self.x,
+                'rows': self.rows, 'eq_rows': self.eq_rows,
+                'ineq_rows': self.ineq_rows, 'nonzeros': self.nonzeros,
+                'integers': self.integers,
+                'sparse_bytes': self.sparse_bytes,
+                'dense_bytes': self.dense_bytes}
+
+    def __repr__(self):
+        return ('ModelSize(task={}, columns={}, rows={}, nonzeros={}, '
+                'sparse={:.1f} MB, dense={:.1f} MB)'.format(
+                    self.task, self.columns, self.rows, self.nonzeros,
+                    self.sparse_bytes / 2 ** 20,
+                    self.dense_bytes / 2 ** 20))
+
+
+def estimate_size(net, task, presolve=False, tighten=False):
+    """
+    :param net: BSS network after create()
+    :param task: 'lppfs', 'milppfs' or 'milpop'
+    :param presolve: x of the network arcs only (otherwise all candidate
+    arcs, (sites * types) ** 2 station pairs)
+    :param tighten: object_linking rows of MILPPFS and MILPOP
+    :return: ModelSize
+    """
+    g_num, o_num = len(net.g_p), len(net.o_p)
+    s_num = net.node_num - net.s_first
+    row = net.node_num
+    tails, heads = net.edges()
+    kind = node_kind(net)
+    edges = len(tails)
+    station_input = int(np.count_nonzero(kind[heads] == STATION))
+    o2s = int(np.count_nonzero(kind[tails] == OBJECT))
+
+    if presolve:
+        x = edges
+    else:
+        x = o_num * s_num + s_num * (s_num - 1) + s_num * g_num
+    y = 0 if task == 'lppfs' else s_num
+    w = row if task in ('lppfs', 'milppfs') else 0
+    # only the arcs of the network have incidence entries
+    eq_nonzeros = 2 * edges + w
+    if task == 'lppfs':
+        eq_rows, ineq_rows = row, row
+        ineq_nonzeros = station_input
+    elif task == 'milppfs':
+        eq_rows, ineq_rows = row + 1, row + net.type_num + net.site_num
+        eq_nonzeros += y
+        ineq_nonzeros = station_input + 3 * y
+    elif task == 'milpop':
+        eq_rows, ineq_rows = row, row + net.site_num
+        ineq_nonzeros = station_input + 2 * y
+    else:
+        raise ValueError('Unknown task {!r}'.format(task))
+    if tighten and task != 'lppfs':
+        ineq_rows += o2s
+        ineq_nonzeros += 2 * o2s
+    return ModelSize(task, x + y + w, x, eq_rows, ineq_rows,
+                     eq_nonzeros + ineq_nonzeros, y)
+
+
+def memory_budget():
+    """
+    :return: MEMORY_BUDGET or half of the physical memory, None if it is
+    not known
+    """
+    if MEMORY_BUDGET is not None:
+        return MEMORY_BUDGET
+    try:
+        return os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') // 2
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def guard_memory(size, sparse, budget=None):
+    """
+    :param size: ModelSize
+    :param sparse: sparse matrices are asked for
+    :param budget: bytes, default - memory_budget()
+    :return: sparse flag to use: True if the dense matrices do not fit the
+    budget (with a warning)
+    :raise ModelTooLargeError: the sparse model does not fit either
+    """
+    if budget is None:
+        budget = memory_budget()
+    if budget is None:
+        return sparse
+    if size.sparse_bytes > budget:
+        raise ModelTooLargeError(size, budget)
+    if not sparse and size.dense_bytes > budget:
+        warnings.warn('Dense {} model needs about {:.0f} MB, more than the '
+                      'memory budget {:.0f} MB, sparse matrices are used'
+                      .format(size.task, size.dense_bytes / 2 ** 20,
+                              budget / 2 ** 20), ResourceWarning)
+        return True
+    return sparse
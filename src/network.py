@@ -1,28 +1,132 @@
 """
 Base sta system
 """
-import itertools
-import math
-
 import networkx as nx
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.csgraph import breadth_first_order
+
+from src.geometry import (CHUNK_SIZE, ArrayMap, as_points, distance,
+                          find_edges, with_item, without_item)
+from src.profiling import span
+
+
+class DisconnectedNetworkError(AssertionError):
+    """
+    Some objects have no path to the gateway.
+    It is an AssertionError as the former assert of check_o2g_path.
+    """
+    def __init__(self, report):
+        self.report = report
+        self.unreachable = report['unreachable']
+        super().__init__('The graph does not link all objects with the '
+                         'gateway, unreachable objects: {}'
+                         .format(self.unreachable))
 
 
 class BSS:
+    """
+    Network of gateway, objects and station nodes.
+    Every station place (site) is repeated once per station type, so the
+    station node of type t (from 0) at site k is
+    s_first + t * site_num + k. Geometry is computed once per site and
+    the edges of every type are derived from it.
+    The graph is kept as scipy CSR (out edges) and CSC (in edges) adjacency,
+    networkx graph G is built only when it is asked for (e.g. to draw it).
+    After create() the network can be changed incrementally by add_site,
+    remove_site, move_object and add_station_type, which return the delta
+    of the edges.
+    """
     def __init__(self, gate, obj, station, sta_type):
+        """
+        :param gate: {'pos': {node: (x, y)}, 'lim': {node: limit}}
+        :param obj: {'pos': ..., 'lim': ...} of the objects
+        :param station: {'pos': {site: (x, y)}} of the station places
+        :param sta_type: {type: {'limit', 'coverage', 'link_distance',
+        'cost'}}
+        Positions and limits can be ArrayMap (see src.instance), they are
+        used as arrays then.
+        """
         self.g_p = gate['pos']
         self.o_p = obj['pos']
-        self.s_p = {k + len(self.o_p) + 1: value for k, value in
-                    enumerate(list(station['pos'].values()) * len(sta_type))}
+        self.g_lim = gate.get('lim', {})
+        self.o_lim = obj.get('lim', {})
+        self.sta_pos = (station['pos'] if isinstance(station['pos'], ArrayMap)
+                        else dict(station['pos']))
+        self.sta_type = dict(sta_type)
         self.coverage = None
         self.link_distance = None
-        self.G = nx.DiGraph()
         self.adj_matrix = None
+        self.adj_in = None
+        self._G = None
+        self.reachability = None
 
         self.c = [sta_type[i + 1]['coverage']
                   for i in range(len(sta_type))]
         self.ld = [sta_type[i + 1]['link_distance']
                    for i in range(len(sta_type))]
 
+        self.site_num = len(station['pos'])
+        self.type_num = len(sta_type)
+        self.s_first = len(self.o_p) + 1
+        _, self.site_pos = as_points(station['pos'])
+        self.s_p = self.station_positions()
+        self.node_num = len(gate['pos']) + len(self.o_p) + len(self.s_p)
+
+        # site geometry: (site, object), (site, site), (site, gateway) pairs
+        # with distance
+        self.s2o = None
+        self.s2s = None
+        self.s2g = None
+        self.method = 'dense'
+        self.chunk_size = CHUNK_SIZE
+
+    @property
+    def G(self):
+        """ networkx graph of the network, built from adjacency on demand """
+        if self._G is None:
+            self._G = nx.DiGraph()
+            self._G.add_nodes_from(range(self.node_num))
+            if self.adj_matrix is not None:
+                tails, heads = self.adj_matrix.nonzero()
+                self._G.add_edges_from(zip(tails.tolist(), heads.tolist()))
+        return self._G
+
+    def out_neighbors(self, i):
+        """ heads of the edges from node i """
+        adj = self.adj_matrix
+        return adj.indices[adj.indptr[i]:adj.indptr[i + 1]]
+
+    def in_neighbors(self, i):
+        """ tails of the edges to node i """
+        adj = self.adj_in
+        return adj.indices[adj.indptr[i]:adj.indptr[i + 1]]
+
+    def station_param(self, name):
+        """
+        :param name: station type parameter ('limit', 'cost', ...)
+        :return: array of the parameter for every station node
+        """
+        value = [self.sta_type[i + 1][name] for i in range(self.type_num)]
+        return np.repeat(value, self.site_num)
+
+    def station_positions(self):
+        """
+        :return: ArrayMap of station node positions, the sites repeated
+        once per type
+        """
+        s_num = self.site_num * self.type_num
+        return ArrayMap(np.arange(self.s_first, self.s_first + s_num),
+                        np.tile(self.site_pos, (self.type_num, 1)))
+
+    def station_node(self, t, k):
+        """
+        :param t: station type index (from 0)
+        :param k: site index (from 0)
+        :return: station node
+        """
+        return self.s_first + t * self.site_num + k
+
     def prepare_sta_param(self):
         """
         prepare sta params
@@ -41,42 +145,332 @@ class BSS:
         self.link_distance = {k + _s_key[0]: value
                               for k, value in enumerate(_link)}
 
+    def reach_gateway(self):
+        """
+        one reverse breadth-first search from the gateways
+        :return: bool array, True for nodes which have path to a gateway
+        """
+        reverse = self.adj_in.T
+        reached = np.zeros(self.node_num, dtype=bool)
+        for gateway in self.g_p.keys():
+            reached[breadth_first_order(reverse, gateway, directed=True,
+                                        return_predecessors=False)] = True
+        return reached
+
+    def reach_from_objects(self):
+        """
+        one breadth-first search from all objects (through a super source)
+        :return: bool array, True for nodes which have path from an object
+        """
+        o_key, _ = as_points(self.o_p)
+        n = self.node_num
+        source = sp.coo_matrix((np.ones(len(o_key), dtype=np.int64),
+                                (np.full(len(o_key), n), o_key)),
+                               shape=(n + 1, n + 1))
+        adj = sp.bmat([[self.adj_matrix, None], [None, sp.csr_matrix((1, 1))]])
+        order = breadth_first_order((adj + source).tocsr(), n, directed=True,
+                                    return_predecessors=False)
+        reached = np.zeros(n + 1, dtype=bool)
+        reached[order] = True
+        return reached[:n]
+
+    def unreachable_objects(self):
+        """
+        :return: array of objects without path to the gateway
+        """
+        o_key, _ = as_points(self.o_p)
+        return o_key[~self.reach_gateway()[o_key]]
+
+    def check_o2g_path(self, raise_error=True):
+        """
+        check that every object has a path to the gateway
+        :param raise_error: raise DisconnectedNetworkError if it is not so
+        :return: report {'gateway', 'object_num', 'unreachable', 'connected'}
+        """
+        unreachable = self.unreachable_objects().tolist()
+        self.reachability = {'gateway': list(self.g_p.keys()),
+                             'object_num': len(self.o_p),
+                             'unreachable': unreachable,
+                             'connected': not unreachable}
+        if unreachable and raise_error:
+            raise DisconnectedNetworkError(self.reachability)
+        return self.reachability
+
     @staticmethod
-    def make_edge(i, j, point1, point2, param):
-        distance = math.sqrt((point1[i][0] - point2[j][0]) ** 2 +
-                             (point1[i][1] - point2[j][1]) ** 2)
-        return distance < param[i]
-
-    def check_o2g_path(self):
-        gateway = list(self.g_p.keys())[0]
-        paths_exist = all([nx.has_path(self.G, i, gateway)
-                           for i in list(self.o_p.keys())])
-        assert paths_exist, \
-            'The graph does not link all objects with the gateway'
-
-    def create(self):
+    def site_pairs(site_pos, pos, radius, method, chunk_size):
+        """
+        (site, point) pairs closer than radius
+        :return: site index, point index and distance arrays
+        """
+        site_radius = np.full(len(site_pos), radius, dtype=float)
+        i, j = find_edges(site_pos, pos, site_radius, method, chunk_size)
+        return i, j, distance(site_pos, pos, i, j)
+
+    def create_geometry(self, chunk_size=CHUNK_SIZE, method='dense'):
+        """
+        find site pairs at the largest coverage and link distance of the
+        station types
+        """
+        _, g_pos = as_points(self.g_p)
+        _, o_pos = as_points(self.o_p)
+        self.s2o = self.site_pairs(self.site_pos, o_pos, max(self.c),
+                                   method, chunk_size)
+        # (k, k) pairs are kept, they link types at the same site
+        self.s2s = self.site_pairs(self.site_pos, self.site_pos, max(self.ld),
+                                   method, chunk_size)
+        self.s2g = self.site_pairs(self.site_pos, g_pos, max(self.ld),
+                                   method, chunk_size)
+
+    def type_edges(self, geometry=None, types=None):
+        """
+        threshold site geometry by coverage and link distance of every type
+        :param geometry: (s2o, s2s, s2g) site pairs, default - all the
+        geometry of the network
+        :param types: only edges with a station of these types, default - all
+        :return: tail and head node arrays
+        """
+        s2o, s2s, s2g = geometry or (self.s2o, self.s2s, self.s2g)
+        types = set(range(self.type_num) if types is None else types)
+        g_key, _ = as_points(self.g_p)
+        o_key, _ = as_points(self.o_p)
+        empty = np.empty(0, dtype=np.int64)
+        tails, heads = [empty], [empty]
+        for t in range(self.type_num):
+            if t in types:
+                # add edge of object2station
+                k, o, d = s2o
+                keep = d < self.c[t]
+                tails.append(o_key[o[keep]])
+                heads.append(self.station_node(t, k[keep]))
+
+                # add edge of station2gateway
+                k, g, d = s2g
+                keep = d < self.ld[t]
+                tails.append(self.station_node(t, k[keep]))
+                heads.append(g_key[g[keep]])
+
+            # add edge of station2station to the stations of every type
+            k1, k2, d = s2s
+            keep = d < self.ld[t]
+            k1, k2 = k1[keep], k2[keep]
+            for t2 in range(self.type_num):
+                if t not in types and t2 not in types:
+                    continue
+                other = (k1 != k2) if t2 == t else slice(None)
+                tails.append(self.station_node(t, k1[other]))
+                heads.append(self.station_node(t2, k2[other]))
+        return np.concatenate(tails), np.concatenate(heads)
+
+    def create(self, chunk_size=CHUNK_SIZE, method='dense', check=True):
+        """
+        create graph of the network.
+        Edge of a station exists if the distance is less than its coverage
+        (object2station) or its link distance (station2station and
+        station2gateway).
+        :param chunk_size: tile size of distance arrays
+        :param method: edge search: 'dense' (all pairs), 'kdtree' or 'grid'
+        spatial index. Spatial index is faster when coverage and link
+        distance are small compared with the area.
+        :param check: raise DisconnectedNetworkError if some objects have no
+        path to the gateway, otherwise only keep the report in reachability
+        """
+        self.method = method
+        self.chunk_size = chunk_size
         self.prepare_sta_param()
-        # create graph(G) nodes
-        self.G.add_nodes_from([i for i in range(len(self.g_p) +
-                                                len(self.s_p) +
-                                                len(self.o_p))])
-        for o2s in itertools.product(self.o_p.keys(), self.s_p.keys()):
-            if self.make_edge(o2s[1], o2s[0],
-                              self.s_p, self.o_p, self.coverage):
-                self.G.add_edge(o2s[0], o2s[1])
-
-        # add edge of station2station
-        for s2s in itertools.permutations(self.s_p.keys(), 2):
-            if self.make_edge(s2s[0], s2s[1],
-                              self.s_p, self.s_p, self.link_distance):
-                self.G.add_edge(s2s[0], s2s[1])
-
-        # add edge of station2gateway
-        for s2g in itertools.product(self.s_p.keys(), self.g_p.keys()):
-            if self.make_edge(s2g[0], s2g[1],
-                              self.s_p, self.g_p, self.link_distance):
-                self.G.add_edge(s2g[0], s2g[1])
-
-        self.check_o2g_path()
-
-        self.adj_matrix = nx.adjacency_matrix(self.G)
+        with span('create_geometry'):
+            self.create_geometry(chunk_size, method)
+        with span('set_edges'):
+            self.set_edges(*self.type_edges())
+        with span('check_o2g_path'):
+            self.check_o2g_path(raise_error=check)
+
+    def set_edges(self, tails, heads):
+        """
+        build CSR and CSC adjacency from edge arrays
+        """
+        n = self.node_num
+        adj = sp.coo_matrix((np.ones(len(tails), dtype=np.int64),
+                             (tails, heads)), shape=(n, n)).tocsr()
+        adj.sum_duplicates()
+        adj.sort_indices()
+        self.adj_matrix = adj
+        self.adj_in = adj.tocsc()
+        self.adj_in.sort_indices()
+        self._G = None
+
+    def edges(self):
+        """
+        :return: tail and head node arrays of all edges
+        """
+        tails, heads = self.adj_matrix.nonzero()
+        return tails.astype(np.int64), heads.astype(np.int64)
+
+    @staticmethod
+    def _select(pairs, keep):
+        return tuple(a[keep] for a in pairs)
+
+    @staticmethod
+    def _join(pairs, other):
+        return tuple(np.concatenate([a, b]) for a, b in zip(pairs, other))
+
+    def _renumber(self, site_num, site_map):
+        """
+        change the number of sites and renumber the station nodes
+        :param site_num: new number of sites
+        :param site_map: new index of every old site, -1 if it is removed
+        :return: new node of every old node, -1 if it is removed
+        """
+        relabel = np.arange(self.node_num)
+        t, k = np.divmod(relabel[self.s_first:] - self.s_first, self.site_num)
+        new_k = site_map[k]
+        relabel[self.s_first:] = np.where(
+            new_k < 0, -1, self.s_first + t * site_num + new_k)
+        self.site_num = site_num
+        return relabel
+
+    def _update(self, added, relabel=None, removed_tails=None):
+        """
+        apply edge delta to adjacency
+        :param added: tail and head arrays of new edges (new numbering)
+        :param relabel: new node of every old node, -1 if it is removed
+        :param removed_tails: old edges from these nodes are rebuilt
+        :return: delta {'added', 'removed', 'relabel'}
+        """
+        tails, heads = self.edges()
+        drop = np.zeros(len(tails), dtype=bool)
+        if relabel is not None:
+            drop |= (relabel[tails] < 0) | (relabel[heads] < 0)
+        if removed_tails is not None:
+            drop |= np.isin(tails, removed_tails)
+        removed = (tails[drop], heads[drop])
+        tails, heads = tails[~drop], heads[~drop]
+        if relabel is not None:
+            tails, heads = relabel[tails], relabel[heads]
+
+        self.s_p = self.station_positions()
+        self.node_num = len(self.g_p) + len(self.o_p) + len(self.s_p)
+        self.prepare_sta_param()
+        self.set_edges(np.concatenate([tails, added[0]]),
+                       np.concatenate([heads, added[1]]))
+        self.check_o2g_path(raise_error=False)
+
+        if removed_tails is not None:
+            # edges which are removed and added again are not changed
+            old = removed[0] * self.node_num + removed[1]
+            new = added[0] * self.node_num + added[1]
+            same = np.isin(old, new)
+            removed = (removed[0][~same], removed[1][~same])
+            keep = ~np.isin(new, old)
+            added = (added[0][keep], added[1][keep])
+        return {'added': added, 'removed': removed, 'relabel': relabel}
+
+    def add_site(self, pos, site=None):
+        """
+        add a station place; every station type gets a node at it
+        :param pos: (x, y) of the place
+        :param site: key of the place, default - next integer key
+        :return: delta {'added': (tails, heads) in new numbering,
+        'removed': (tails, heads) in old numbering,
+        'relabel': new node of every old node}
+        """
+        if site is None:
+            site = int(as_points(self.sta_pos)[0].max(initial=0)) + 1
+        if site in self.sta_pos:
+            raise ValueError('Station place {} already exists'.format(site))
+        k = self.site_num
+        relabel = self._renumber(k + 1, np.arange(k))
+        self.sta_pos = with_item(self.sta_pos, site, pos)
+        self.site_pos = np.vstack([self.site_pos, np.reshape(pos, (1, 2))])
+
+        # only distances to the new place are computed
+        new_pos = self.site_pos[k:]
+        _, g_pos = as_points(self.g_p)
+        _, o_pos = as_points(self.o_p)
+        _, o, d = self.site_pairs(new_pos, o_pos, max(self.c),
+                                  'dense', self.chunk_size)
+        s2o = (np.full(len(o), k), o, d)
+        _, k2, d = self.site_pairs(new_pos, self.site_pos, max(self.ld),
+                                   'dense', self.chunk_size)
+        mirror = k2 != k
+        s2s = (np.concatenate([np.full(len(k2), k), k2[mirror]]),
+               np.concatenate([k2, np.full(mirror.sum(), k)]),
+               np.concatenate([d, d[mirror]]))
+        _, g, d = self.site_pairs(new_pos, g_pos, max(self.ld),
+                                  'dense', self.chunk_size)
+        s2g = (np.full(len(g), k), g, d)
+
+        self.s2o = self._join(self.s2o, s2o)
+        self.s2s = self._join(self.s2s, s2s)
+        self.s2g = self._join(self.s2g, s2g)
+        return self._update(self.type_edges((s2o, s2s, s2g)), relabel)
+
+    def remove_site(self, site):
+        """
+        remove a station place with the stations of every type at it
+        :param site: key of the place
+        :return: delta {'added', 'removed', 'relabel'}, see add_site
+        """
+        if site not in self.sta_pos:
+            raise KeyError('Station place {} does not exist'.format(site))
+        k = int(np.flatnonzero(as_points(self.sta_pos)[0] == site)[0])
+        site_map = np.arange(self.site_num)
+        site_map[k] = -1
+        site_map[k + 1:] -= 1
+        relabel = self._renumber(self.site_num - 1, site_map)
+        self.sta_pos = without_item(self.sta_pos, site)
+        self.site_pos = np.delete(self.site_pos, k, axis=0)
+
+        s2o = self._select(self.s2o, self.s2o[0] != k)
+        self.s2o = (site_map[s2o[0]],) + s2o[1:]
+        s2s = self._select(self.s2s, (self.s2s[0] != k) & (self.s2s[1] != k))
+        self.s2s = (site_map[s2s[0]], site_map[s2s[1]], s2s[2])
+        s2g = self._select(self.s2g, self.s2g[0] != k)
+        self.s2g = (site_map[s2g[0]],) + s2g[1:]
+        empty = np.empty(0, dtype=np.int64)
+        return self._update((empty, empty), relabel)
+
+    def move_object(self, o, pos):
+        """
+        move an object to new position
+        :param o: object node
+        :param pos: new (x, y) of the object
+        :return: delta {'added', 'removed', 'relabel'}, see add_site
+        """
+        if o not in self.o_p:
+            raise KeyError('Object {} does not exist'.format(o))
+        self.o_p = with_item(self.o_p, o, pos)
+        o_key, o_pos = as_points(self.o_p)
+        j = int(np.flatnonzero(o_key == o)[0])
+        k, _, d = self.site_pairs(self.site_pos, o_pos[j:j + 1], max(self.c),
+                                  'dense', self.chunk_size)
+        s2o = (k, np.full(len(k), j), d)
+        self.s2o = self._join(self._select(self.s2o, self.s2o[1] != j), s2o)
+        added = self.type_edges((s2o, self._select(self.s2s, []),
+                                 self._select(self.s2g, [])))
+        return self._update(added, removed_tails=[o])
+
+    def add_station_type(self, param, key=None):
+        """
+        add a station type; it gets a node at every station place.
+        New nodes are numbered after the existing ones.
+        :param param: {'limit', 'coverage', 'link_distance', 'cost'}
+        :param key: key of the type, only the next integer key (types are
+        numbered from 1 without gaps), default - the next key
+        :return: delta {'added', 'removed', 'relabel'}, see add_site
+        """
+        if key is None:
+            key = self.type_num + 1
+        if key != self.type_num + 1:
+            raise ValueError('Station type key must be {}, not {}'.format(
+                self.type_num + 1, key))
+        self.sta_type[key] = param
+        grow = (param['coverage'] > max(self.c) or
+                param['link_distance'] > max(self.ld))
+        self.c.append(param['coverage'])
+        self.ld.append(param['link_distance'])
+        self.type_num += 1
+        if grow:
+            # stored pairs do not reach the new radius
+            self.create_geometry(self.chunk_size, self.method)
+        added = self.type_edges(types=[self.type_num - 1])
+        return self._update(added)
@@ -0,0 +1,74 @@
+"""
+Solver options, common for all backends
+"""
+import time
+
+
+class SolveOptions:
+    """
+    time_limit - seconds, mip_rel_gap / mip_abs_gap - stop when the gap of
+    the incumbent and the bound is not more, threads, seed, node_limit -
+    branch-and-bound nodes. None is the solver default.
+    callback(incumbent) is called for every improved MILP solution with
+    incumbent dict: 'time' (seconds from the start), 'objective', 'bound'
+    and 'x' (solution vector); the solver stops if it returns True.
+    Options which a backend has not are skipped (see the backend).
+    """
+    def __init__(self, time_limit=None, mip_rel_gap=None, mip_abs_gap=None,
+                 threads=None, seed=None, node_limit=None, callback=None):
+        self.time_limit = time_limit
+        self.mip_rel_gap = mip_rel_gap
+        self.mip_abs_gap = mip_abs_gap
+        self.threads = threads
+        self.seed = seed
+        self.node_limit = node_limit
+        self.callback = callback
+
+    def _named(self, names):
+        return {name: getattr(self, key) for key, name in names.items()
+                if getattr(self, key) is not None}
+
+    def highs(self):
+        """ HiGHS option values """
+        return self._named({'time_limit': 'time_limit',
+                            'mip_rel_gap': 'mip_rel_gap',
+                            'mip_abs_gap': 'mip_abs_gap',
+                            'threads': 'threads',
+                            'seed': 'random_seed',
+                            'node_limit': 'mip_max_nodes'})
+
+    def scipy(self, mip=True):
+        """ scipy.optimize milp (mip) or linprog options """
+        names = {'time_limit': 'time_limit'}
+        if mip:
+            names.update({'mip_rel_gap': 'mip_rel_gap',
+                          'node_limit': 'node_limit'})
+        return self._named(names)
+
+    def gurobi(self):
+        """ Gurobi parameters """
+        return self._named({'time_limit': 'TimeLimit',
+                            'mip_rel_gap': 'MIPGap',
+                            'mip_abs_gap': 'MIPGapAbs',
+                            'threads': 'Threads',
+                            'seed': 'Seed',
+                            'node_limit': 'NodeLimit'})
+
+    def matlab(self):
+        """ intlinprog optimoptions """
+        return self._named({'time_limit': 'MaxTime',
+                            'mip_rel_gap': 'RelativeGapTolerance',
+                            'mip_abs_gap': 'AbsoluteGapTolerance',
+                            'node_limit': 'MaxNodes'})
+
+    def incumbent(self, start, objective, bound, x):
+        """
+        pass improved solution to the callback
+        :param start: time.monotonic() of the solver start
+        :return: True if the solver should stop
+        """
+        if self.callback is None:
+            return False
+        return bool(self.callback({'time': time.monotonic() - start,
+                                   'objective': objective, 'bound': bound,
+                                   'x': x}))
@@ -0,0 +1,189 @@
+"""
+Presolve: drop variables and rows which can not take part in a solution
+"""
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.csgraph import breadth_first_order
+
+from src.geometry import as_points, as_values
+
+# station type parameters: more is better, less is better
+MORE = ('coverage', 'link_distance', 'limit')
+LESS = ('cost',)
+
+
+def useful_nodes(net):
+    """
+    Gateway, objects and the stations which are reachable from an object
+    and have path to the gateway. Other stations can not carry flow.
+    :param net: BSS network
+    :return: bool array of kept nodes
+    """
+    keep = net.reach_gateway() & net.reach_from_objects()
+    keep[as_points(net.g_p)[0]] = True
+    keep[as_points(net.o_p)[0]] = True
+    return keep
+
+
+def dominated_types(sta_type):
+    """
+    Station types which are not better than another type in any parameter:
+    coverage, link distance and limit are not more, cost is not less.
+    Such a type can be changed to the other at any site, the network keeps
+    all its edges and capacity and the cost is not more. Of equal types
+    the first one is kept.
+    :param sta_type: {type: {'limit': ..., 'coverage': ..., ...}}
+    :return: {dominated type: type which dominates it}
+    """
+    keys = list(sta_type)
+    dominated = {}
+    for b in keys:
+        for a in keys:
+            if a == b:
+                continue
+            pa, pb = sta_type[a], sta_type[b]
+            better = [pa[p] >= pb[p] for p in MORE if p in pb]
+            better += [pa.get(p, 0) <= pb.get(p, 0) for p in LESS]
+            equal = all(pa.get(p) == pb.get(p) for p in MORE + LESS)
+            if all(better) and (not equal or keys.index(a) < keys.index(b)):
+                dominated[b] = a
+                break
+    # point to the types which are kept
+    for b in dominated:
+        while dominated[b] in dominated:
+            dominated[b] = dominated[dominated[b]]
+    return dominated
+
+
+def reduce_catalog(sta_type):
+    """
+    drop dominated station types before the network is built, the types
+    are numbered from 1 again
+    :param sta_type: {type: {...}}
+    :return: reduced sta_type, report {'kept': original types in the new
+    order, 'dominated': {dominated type: type which dominates it}}
+    """
+    dominated = dominated_types(sta_type)
+    kept = [t for t in sta_type if t not in dominated]
+    return ({i + 1: dict(sta_type[t]) for i, t in enumerate(kept)},
+            {'kept': kept, 'dominated': dominated})
+
+
+def dominated_stations(net):
+    """
+    Station nodes which are dominated by another station node of the same
+    site: its neighbours (except the stations of the same site) are a
+    subset of the other's, its limit is not more and its cost is not less.
+    Any placement with it is as good with the other one, so it can be
+    removed. Of equal nodes the first one is kept.
+    :param net: BSS network after create()
+    :return: bool array of dominated nodes
+    """
+    s_num = net.node_num - net.s_first
+    site = np.arange(s_num) % net.site_num
+    node_site = np.full(net.node_num, -1)
+    node_site[net.s_first:] = site
+
+    # neighbour sets of stations: out neighbours, then in neighbours
+    tails, heads = net.edges()
+    out = (tails >= net.s_first) & (node_site[tails] != node_site[heads])
+    inp = (heads >= net.s_first) & (node_site[tails] != node_site[heads])
+    rows = np.concatenate([tails[out], heads[inp]]) - net.s_first
+    cols = np.concatenate([heads[out], tails[inp] + net.node_num])
+    neighbour = sp.csr_matrix((np.ones(len(rows)), (rows, cols)),
+                              shape=(s_num, 2 * net.node_num))
+    neighbour.data[:] = 1
+    size = np.asarray(neighbour.sum(axis=1)).ravel()
+
+    # pairs (a, b) of different types at the same site
+    a = np.repeat(np.arange(s_num), net.type_num)
+    b = np.tile(np.arange(net.type_num), s_num) * net.site_num + site[a]
+    pair = a != b
+    a, b = a[pair], b[pair]
+
+    common = np.asarray(neighbour[a].multiply(neighbour[b]).sum(axis=1))
+    common = common.ravel()
+    limit = net.station_param('limit')
+    cost = (net.station_param('cost')
+            if all('cost' in p for p in net.sta_type.values())
+            else np.zeros(s_num))
+    subset = common == size[b]
+    better = subset & (limit[a] >= limit[b]) & (cost[a] <= cost[b])
+    equal = ((size[a] == size[b]) & (limit[a] == limit[b]) &
+             (cost[a] == cost[b]))
+    dominate = better & (~equal | (a < b))
+
+    dominated = np.zeros(net.node_num, dtype=bool)
+    dominated[b[dominate] + net.s_first] = True
+    return dominated
+
+
+def reachable_demand(net):
+    """
+    :param net: BSS network after create()
+    :return: array of the demand of the objects which have a path to every
+    node (an object has its own demand)
+    """
+    demand = np.zeros(net.node_num)
+    o_k = as_points(net.o_p)[0]
+    for o, lim in zip(o_k.tolist(), as_values(net.o_lim, o_k).tolist()):
+        order = breadth_first_order(net.adj_matrix, o,
+                                    return_predecessors=False)
+        demand[order] += lim
+    return demand
+
+
+def throughput(net):
+    """
+    Upper bound of the flow through every node: not more than the demand
+    which can reach the node and than the node limit (object demand,
+    station limit). The flow of an arc is not more than the throughput of
+    its tail and head, the input of a station is not more than its
+    throughput, which is the tight big-M of its capacity row.
+    :param net: BSS network after create()
+    :return: array of node throughput
+    """
+    bound = reachable_demand(net)
+    bound[net.s_first:] = np.minimum(bound[net.s_first:],
+                                     net.station_param('limit'))
+    return bound
+
+
+def presolve_arcs(net, keep):
+    """
+    arcs of the network between kept nodes
+    :param net: BSS network
+    :param keep: bool array of kept nodes
+    :return: tail and head node arrays
+    """
+    tails, heads = net.edges()
+    on = keep[tails] & keep[heads]
+    return tails[on], heads[on]
+
+
+def drop_empty_rows(matrix, b, equality):
+    """
+    drop rows without coefficients which hold for any solution
+    (0 == 0 or 0 <= b, b >= 0)
+    :param matrix: csr matrix
+    :param b: right hand side vector
+    :param equality: rows are equalities
+    :return: matrix, b, original index of kept rows
+    """
+    nnz = np.diff(matrix.indptr)
+    keep = (nnz > 0) | ((b != 0) if equality else (b < 0))
+    return matrix[keep], b[keep], np.flatnonzero(keep)
+
+
+def expand(variables, full, x):
+    """
+    values of presolved model variables in the columns of the full model,
+    removed variables are 0
+    :param variables: VariableIndex of presolved model
+    :param full: VariableIndex of full model
+    :param x: solution of presolved model
+    :return: solution of full model
+    """
+    values = np.zeros(len(full))
+    values[variables.map_to(full)] = x
+    return values
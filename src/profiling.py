@@ -0,0 +1,189 @@
+"""
+Run instrumentation: nested timing spans of the pipeline stages, optional
+cProfile and tracemalloc capture per stage and model statistics, reported
+as JSON. Spans cost one global check while no Profiler is active.
+
+    with Profiler(memory=True) as profiler:
+        get_milpop_solution(solver='highs')
+    profiler.save('run.json')
+"""
+import contextlib
+import cProfile
+import json
+import pstats
+import time
+import tracemalloc
+
+import numpy as np
+import scipy.sparse as sp
+
+from src.assembly import matrix_values
+
+# active Profiler of the process
+_active = None
+_NULL = contextlib.nullcontext()
+# functions of a stage profile in the report
+TOP_FUNCTIONS = 20
+
+
+def span(name):
+    """
+    timing span of the active Profiler, nothing if there is none
+    :param name: stage name
+    :return: context manager
+    """
+    if _active is None:
+        return _NULL
+    return _active.span(name)
+
+
+def record(compute=None, **stats):
+    """
+    add statistics (numbers, strings) to the current span
+    :param compute: function which returns a dict of statistics, called
+    only while a Profiler is active
+    """
+    if _active is not None:
+        if compute is not None:
+            stats.update(compute())
+        _active.current['stats'].update(stats)
+
+
+def model_stats(problem):
+    """
+    :param problem: LPPFS, MILPPFS or MILPOP problem after create_matrix
+    :return: dict of rows, columns, nonzeros and integer columns
+    """
+    eq = sp.csr_matrix(matrix_values(problem.eq_array))
+    ineq = sp.csr_matrix(matrix_values(problem.ineq_array))
+    return {'rows': int(eq.shape[0] + ineq.shape[0]),
+            'columns': int(np.size(problem.f)),
+            'nonzeros': int(eq.nnz + ineq.nnz),
+            'integers': len(getattr(problem, 'int_constraints', None) or [])}
+
+
+class Profiler:
+    """
+    Collects the spans of a run while it is active (with block).
+    cprofile - cProfile of every top level stage (stages inside it are
+    only timed, one profiler can run at a time), memory - tracemalloc
+    peak of every span, numpy arrays included.
+    """
+    def __init__(self, cprofile=False, memory=False):
+        self.cprofile = cprofile
+        self.memory = memory
+        self.root = self._new('run')
+        self.current = self.root
+        self._stack = []
+        self._previous = None
+        self._own_tracing = False
+        self._start = None
+
+    @staticmethod
+    def _new(name):
+        return {'name': name, 'start': 0.0, 'wall_time': None,
+                'stats': {}, 'children': []}
+
+    def __enter__(self):
+        global _active
+        self._previous = _active
+        _active = self
+        self._own_tracing = self.memory and not tracemalloc.is_tracing()
+        if self._own_tracing:
+            tracemalloc.start()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        global _active
+        self.root['wall_time'] = time.perf_counter() - self._start
+        if self.memory:
+            self.root['peak_memory'] = max(
+                self.root.pop('_peak', 0), tracemalloc.get_traced_memory()[1])
+            if self._own_tracing:
+                tracemalloc.stop()
+        _active = self._previous
+        return False
+
+    @contextlib.contextmanager
+    def span(self, name):
+        node = self._new(name)
+        node['start'] = time.perf_counter() - self._start
+        parent = self.current
+        parent['children'].append(node)
+        self._stack.append(parent)
+        self.current = node
+        profile = None
+        if self.cprofile and parent is self.root:
+            profile = cProfile.Profile()
+        if self.memory:
+            # the peak is reset for the span, the parent keeps its own
+            parent['_peak'] = max(parent.get('_peak', 0),
+                                  tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            if profile is not None:
+                profile.enable()
+            yield node
+        finally:
+            if profile is not None:
+                profile.disable()
+            node['wall_time'] = time.perf_counter() - start
+            if self.memory:
+                peak = max(node.pop('_peak', 0),
+                           tracemalloc.get_traced_memory()[1])
+                node['peak_memory'] = peak
+                parent['_peak'] = max(parent['_peak'], peak)
+            if profile is not None:
+                node['profile'] = _top_functions(profile)
+            self.current = self._stack.pop()
+
+    def report(self):
+        """
+        :return: report dict: options and the span tree (name, start and
+        wall_time in seconds, stats, peak_memory in bytes, profile,
+        children)
+        """
+        return {'cprofile': self.cprofile, 'memory': self.memory,
+                'run': _clean(self.root)}
+
+    def save(self, path):
+        with open(path, 'w') as file:
+            json.dump(self.report(), file, indent=1)
+
+    def stages(self):
+        """
+        :return: {span path ('a/b'): wall time} of all spans
+        """
+        times = {}
+
+        def walk(node, prefix):
+            for child in node['children']:
+                path = prefix + child['name']
+                times[path] = times.get(path, 0) + child['wall_time']
+                walk(child, path + '/')
+        walk(self.root, '')
+        return times
+
+
+def _clean(node):
+    node = {key: value for key, value in node.items()
+            if not key.startswith('_')}
+    node['children'] = [_clean(child) for child in node['children']]
+    return node
+
+
+def _top_functions(profile):
+    """
+    :return: list of the functions with the largest cumulative time
+    """
+    stats = pstats.Stats(profile)
+    rows = []
+    for (file, line, function), (_, calls, total, cumulative, _) in \
+            stats.stats.items():
+        rows.append({'function': '{}:{}({})'.format(file, line, function),
+                     'calls': calls, 'total_time': total,
+                     'cumulative_time': cumulative})
+    rows.sort(key=lambda row: -row['cumulative_time'])
+    return rows[:TOP_FUNCTIONS]
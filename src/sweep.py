@@ -0,0 +1,255 @@
+"""
+Scenario sweep: build network, assemble and solve many input variants in
+a process pool and stream the results as they finish
+"""
+import copy
+import importlib
+import multiprocessing
+import os
+import queue
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+
+# task: (input module, station type name, problem class)
+TASKS = {'lppfs': ('problem.lppfs_input', 'sta_set', 'src.task1.lppfs.LPPFS'),
+         'milppfs': ('problem.milppfs_input', 'sta_set',
+                     'src.task2.milppfs.MILPPFS'),
+         'milpop': ('problem.milpop_input', 'sta_type',
+                    'src.task3.milpop.MILPOP')}
+# seconds between the checks of the started tasks
+POLL = 0.05
+# queue of the indexes of started scenarios, set in the worker processes
+_started = None
+
+
+def _load(path):
+    module, name = path.rsplit('.', 1)
+    return getattr(importlib.import_module(module), name)
+
+
+def base_scenario(task, **changes):
+    """
+    scenario of the input module of the task (problem/*_input.py)
+    :param task: 'lppfs', 'milppfs' or 'milpop'
+    :param changes: keys to replace, e.g. sta_type=..., name=...
+    :return: scenario dict with gate, obj, sta, sta_type, task and name
+    """
+    module, type_name, _ = TASKS[task]
+    module = importlib.import_module(module)
+    scenario = {'name': task, 'task': task,
+                'gate': copy.deepcopy(module.gate),
+                'obj': copy.deepcopy(module.obj),
+                'sta': copy.deepcopy(module.sta),
+                'sta_type': copy.deepcopy(getattr(module, type_name))}
+    scenario.update(changes)
+    return scenario
+
+
+def _compiled(scenario, cache):
+    """
+    compiled problem of the scenario, from the cache if it is there
+    :return: CompiledProblem, True if it was found in the cache
+    """
+    from src.cache import make_key, compile_problem, CompiledProblem
+    from src.network import BSS
+
+    presolve = scenario.get('presolve', True)
+    key = make_key('model', scenario['task'], scenario['gate'],
+                   scenario['obj'], scenario['sta'], scenario['sta_type'],
+                   presolve)
+    record = cache.get(key) if cache is not None else None
+    if record is not None:
+        return CompiledProblem(record), True
+    net = BSS(scenario['gate'], scenario['obj'], scenario['sta'],
+              scenario['sta_type'])
+    net.create()
+    problem = _load(TASKS[scenario['task']][2])(net)
+    problem.create_matrix(sparse=True, presolve=presolve)
+    record = compile_problem(problem)
+    if cache is not None:
+        cache.put(key, record)
+    return CompiledProblem(record), False
+
+
+def run_scenario(scenario):
+    """
+    Build, assemble and solve one scenario with HiGHS.
+    Scenario keys: task, gate, obj, sta, sta_type and optional name,
+    presolve (default True), time_limit (solver time limit, seconds),
+    cache (directory of the disk cache, see src.cache; the network, the
+    matrices and the solution are not built again for the same input).
+    :return: result dict: name, status ('ok' or 'error'), objective,
+    placed (station nodes with y = 1), wall_time, error, cached (None,
+    'model' or 'solution')
+    """
+    from src.cache import get_cache, make_key
+    from src.lp_problem import solve_lp_problem
+    import src.highs.milp_problem
+
+    start = time.perf_counter()
+    result = {'name': scenario.get('name'), 'status': 'ok',
+              'objective': None, 'placed': None, 'error': None,
+              'cached': None}
+    cache = get_cache(scenario['cache']) if 'cache' in scenario else None
+    key = None
+    try:
+        time_limit = scenario.get('time_limit')
+        if cache is not None:
+            key = make_key('solution', scenario['task'], scenario['gate'],
+                           scenario['obj'], scenario['sta'],
+                           scenario['sta_type'],
+                           scenario.get('presolve', True), time_limit)
+            record = cache.get(key)
+            if record is not None:
+                result['objective'] = record['objective']
+                if record.get('placed') is not None:
+                    result['placed'] = record['placed'].tolist()
+                result['cached'] = 'solution'
+                result['wall_time'] = time.perf_counter() - start
+                return result
+        problem, hit = _compiled(scenario, cache)
+        if hit:
+            result['cached'] = 'model'
+        if scenario['task'] == 'lppfs':
+            res = solve_lp_problem(problem.f, problem.ineq_array,
+                                   problem.ineq_b, problem.eq_array,
+                                   problem.eq_b, problem.lower_bounds,
+                                   problem.upper_bounds,
+                                   time_limit=time_limit)
+            assert res.feasible, \
+                'There is no solution, LP objective is {} ({})'.format(
+                    res.objective, res.message)
+            result['objective'] = res.objective
+        else:
+            option = ('feasible_solution' if scenario['task'] == 'milppfs'
+                      else 'optimization')
+            x = src.highs.milp_problem.solve(problem, option=option,
+                                             time_limit=time_limit)
+            result['objective'] = float(np.ravel(problem.f) @ x)
+            y = x[problem._y_index] > 0.5
+            result['placed'] = problem.y_nodes[y].tolist()
+        if cache is not None:
+            placed = result['placed']
+            cache.put(key, {'objective': result['objective'],
+                            'placed': None if placed is None
+                            else np.array(placed, dtype=int)})
+    except Exception as error:
+        result['status'] = 'error'
+        result['error'] = '{}: {}'.format(type(error).__name__, error)
+    result['wall_time'] = time.perf_counter() - start
+    return result
+
+
+def _init_worker(started):
+    global _started
+    _started = started
+
+
+def _run(index, scenario):
+    """ run_scenario in a sweep worker, which reports its start """
+    # monotonic clock is system-wide, so the parent compares the start
+    # with its own time
+    _started.put((index, time.monotonic()))
+    return run_scenario(scenario)
+
+
+def sweep(scenarios, workers=None, timeout=None, time_limit=None,
+          cache=None):
+    """
+    Solve scenarios in a process pool, results are yielded in the order
+    they finish. The solver time limit stops long solutions, timeout is the
+    wall deadline (from the start of the scenario in its worker) after
+    which the result is reported as 'timeout' and the rest of the batch
+    goes on. The worker process is not killed: no new scenario is given to
+    it until the late one returns, and the timeout is also the solver time
+    limit of scenarios without one, so it is free again soon after the
+    deadline.
+    :param scenarios: list or generator of scenario dicts (see
+    run_scenario), it is read lazily
+    :param workers: number of processes, default - number of CPUs
+    :param timeout: wall deadline of one scenario, seconds
+    :param time_limit: solver time limit of scenarios which have not their
+    own, default - timeout
+    :param cache: directory of the disk cache of scenarios which have not
+    their own (see run_scenario)
+    :return: generator of result dicts (see run_scenario), every result has
+    'index' of its scenario
+    """
+    workers = workers or os.cpu_count() or 1
+    started = multiprocessing.Queue()
+    executor = ProcessPoolExecutor(max_workers=workers,
+                                   initializer=_init_worker,
+                                   initargs=(started,))
+    pending = iter(enumerate(scenarios))
+    # future: [index, name, start time, None until it runs]
+    running = {}
+    # futures reported as timeout, their workers are still busy
+    late = set()
+    exhausted = False
+    try:
+        while True:
+            while not exhausted and len(running) + len(late) < workers:
+                item = next(pending, None)
+                if item is None:
+                    exhausted = True
+                    break
+                index, scenario = item
+                limit = time_limit if time_limit is not None else timeout
+                if limit is not None and 'time_limit' not in scenario:
+                    scenario = dict(scenario, time_limit=limit)
+                if cache is not None and 'cache' not in scenario:
+                    scenario = dict(scenario, cache=cache)
+                future = executor.submit(_run, index, scenario)
+                running[future] = [index, scenario.get('name'), None]
+            if not running and (exhausted or not late):
+                return
+            wait_time = None
+            if timeout is not None and running:
+                _mark_started(started, running)
+                starts = [task[2] for task in running.values()
+                          if task[2] is not None]
+                # poll until every task runs, then wait for the first
+                # deadline
+                wait_time = POLL
+                if len(starts) == len(running):
+                    wait_time = max(
+                        min(starts) + timeout - time.monotonic(), 0)
+            done, _ = wait(set(running) | late, timeout=wait_time,
+                           return_when=FIRST_COMPLETED)
+            late -= done
+            for future in done:
+                if future not in running:
+                    continue
+                index = running.pop(future)[0]
+                result = future.result()
+                result['index'] = index
+                yield result
+            if timeout is None:
+                continue
+            now = time.monotonic()
+            for future, (index, name, start) in list(running.items()):
+                if start is not None and now - start >= timeout:
+                    running.pop(future)
+                    late.add(future)
+                    yield {'index': index, 'name': name, 'status': 'timeout',
+                           'objective': None, 'placed': None,
+                           'cached': None, 'wall_time': now - start,
+                           'error': 'no result in {} s'.format(timeout)}
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _mark_started(started, running):
+    """
+    set the start time of the running tasks which their workers reported
+    """
+    index_task = {task[0]: task for task in running.values()}
+    while True:
+        try:
+            index, start = started.get_nowait()
+        except queue.Empty:
+            return
+        if index in index_task:
+            index_task[index][2] = start
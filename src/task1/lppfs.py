@@ -1,13 +1,19 @@
 """
 Linear programming problem feasible solution
 """
-from itertools import product
-from itertools import permutations
-
 from problem.lppfs_input import gate, obj, sta, sta_set
 from src.network import BSS
 from src.draw import draw_input_data, draw_lp_graph
 from src.lp_problem import solve_lp_problem
+from src.flow import max_flow
+from src.assembly import (candidate_arcs, incidence, station_input,
+                          make_sparse, to_frame, matrix_values, node_limit)
+from src.geometry import as_points
+from src.variables import VariableIndex
+from src.presolve import useful_nodes, presolve_arcs, drop_empty_rows, expand
+from src.cache import get_cache, run_key, run_record, cached_network
+from src.model_size import estimate_size, guard_memory
+from src.profiling import span, record, model_stats
 
 import pandas as pd
 import numpy as np
@@ -17,16 +23,16 @@ class LPPFS:
     """ Linear programming problem feasible solution"""
     def __init__(self, network):
         self.net = network
-        self.adj_mat = network.adj_matrix.toarray()
 
-        self.g_lim = gate['lim']
-        self.o_lim = obj['lim']
+        self.g_lim = network.g_lim
+        self.o_lim = network.o_lim
         self.limit = None
 
-        self._lim = [sta_set[i + 1]['limit']
-                     for i in range(len(sta_set))]
-        self._l = None
+        self._lim = [network.sta_type[i + 1]['limit']
+                     for i in range(network.type_num)]
+        self._node_limit = None
 
+        self.variables = None
         self.f = None
         self.lower_bounds = None
         self.upper_bounds = None
@@ -34,162 +40,220 @@ class LPPFS:
         self.eq_b = None
         self.ineq_array = None
         self.ineq_b = None
+        self.eq_rows = None
+        self.ineq_rows = None
+        self.presolve_report = None
+        self.size = None
 
-    @staticmethod
-    def value_name(name, edge_name):
-        return [name + '_'.join(map(str, edge_name[i]))
-                for i in range(len(edge_name))]
-
-    def create_edge(self):
-        g_k = ''.join(map(str, list(self.net.g_p.keys())))
-        o_k = ''.join(map(str, list(self.net.o_p.keys())))
-        s_k = ''.join(map(str, list(self.net.s_p.keys())))
-
-        o_s = [i for i in product(o_k, s_k)]
-        s_s = [i for i in permutations(s_k, 2)]
-        s_g = [i for i in product(s_k, g_k)]
-
-        o_s_name = self.value_name('x', o_s)
-        s_s_name = self.value_name('x', s_s)
-        s_g_name = self.value_name('x', s_g)
-
-        return o_s_name + s_s_name + s_g_name
-
-    def create_value(self, w_num):
-        x = self.create_edge()
-        w = ['w' + str(i) for i in range(w_num)]
-
-        return [x, w]
-
-    def make_objective(self, x, w):
+    def create_value(self, w_num, keep=None):
+        """
+        x: object2station, station2station and station2gateway arcs,
+        w: one per row
+        :param keep: bool array of presolve kept nodes, then x are only the
+        arcs of the network between kept nodes and w are kept node rows
+        :return: VariableIndex
+        """
+        variables = VariableIndex(self.net.node_num)
+        if keep is None:
+            variables.add_arcs('x', *candidate_arcs(self.net))
+            variables.add_nodes('w', np.arange(w_num))
+        else:
+            variables.add_arcs('x', *presolve_arcs(self.net, keep))
+            variables.add_nodes('w', np.flatnonzero(keep))
+        return variables
+
+    def make_objective(self):
         """
         make objective function
-        :param x: name of x parameter vector
-        :param w: name of w parameter vector
         :return: self.f
         """
-        col = x + w
-        data = np.zeros([1, len(col)]).astype(int)
-        self.f = pd.DataFrame(data, columns=col)
-        column, = np.where(np.in1d(self.f.columns.values, w))
+        self.f = np.zeros([1, len(self.variables)])
 
         # Objective function consist on only w values
-        self.f.iloc[0, column] = 1
-
-        self.lower_bounds = np.zeros([1, len(col)]).astype(int)
-        self.upper_bounds = np.ones([1, len(col)]).astype(int) * np.inf
-
-    def make_for_g(self, i):
-        adj_mat_r, = np.where(self.adj_mat[:, i] == 1)
-        adj_mat_r_name = ['x' + str(adj_mat_r[j]) + '_' +
-                          str(i) for j in range(len(adj_mat_r))]
-
-        column, = np.where(np.in1d(self.eq_array.columns.values,
-                                   adj_mat_r_name))
-        self.eq_array.iloc[i, column] = 1
-        self.eq_array.loc[i, 'w' + str(i)] = 1
-        self.eq_b[i] = sum(self._l[j] for j in list(self.net.o_p.keys()))
-
-    def make_for_o(self, i):
-        adj_mat_c, = np.where(self.adj_mat[i, :] == 1)
-        adg_mat_c_name = ['x' + str(i) + '_' +
-                          str(adj_mat_c[j]) for j in range(len(adj_mat_c))]
-
-        column, = np.where(np.in1d(self.eq_array.columns.values,
-                                   adg_mat_c_name))
-        self.eq_array.iloc[i, column] = 1
-        self.eq_array.loc[i, 'w' + str(i)] = 1
-        self.eq_b[i] = self._l[i]
-
-    def add_input_edge_s(self, i, array):
-        row_mat, = np.where(self.adj_mat[:, i] == 1)
-        mat_name_plus = ['x' + str(row_mat[j]) + '_' + str(i)
-                         for j in range(len(row_mat))]
-
-        column_plus, = np.where(np.in1d(array.columns.values,
-                                        mat_name_plus))
-        array.iloc[i, column_plus] = 1
-
-    def make_for_s(self, i):
-
-        self.add_input_edge_s(i, self.eq_array)
-
-        col_mat, = np.where(self.adj_mat[i, :] == 1)
-        mat_name_minus = ['x' + str(i) + '_' + str(col_mat[j])
-                          for j in range(len(col_mat))]
-        column_minus, = np.where(np.in1d(self.eq_array.columns.values,
-                                         mat_name_minus))
-        self.eq_array.iloc[i, column_minus] = -1
-        self.eq_array.loc[i, 'w' + str(i)] = 1
-        self.eq_b[i] = 0
-
-    def make_equality(self, row, x, w):
-        data_eq = np.zeros([row, len(x + w)]).astype(int)
-        self.eq_b = np.zeros(row)
-        self.eq_array = pd.DataFrame(data_eq, columns=x+w)
-
-        for i in range(row + 1):
-            if i in list(self.net.g_p.keys()):
-                self.make_for_g(i)
+        self.f[0, self.variables.block('w')] = 1
 
-            if i in list(self.net.o_p.keys()):
-                self.make_for_o(i)
+        self.lower_bounds = np.zeros([1, len(self.variables)])
+        self.upper_bounds = np.full([1, len(self.variables)], np.inf)
 
-            if i in list(self.net.s_p.keys()):
-                self.make_for_s(i)
-
-    def make_inequality(self, row, x, w):
-        data_ineq = np.zeros([row, len(x + w)]).astype(int)
+    def make_equality(self, row):
+        """
+        flow conservation rows: gateway gets the demand of all objects,
+        object sends its demand, station sends all it gets;
+        every row has its w value
+        """
+        self.eq_b = np.zeros(row)
+        o_k = as_points(self.net.o_p)[0]
+        self.eq_b[o_k] = self._node_limit[o_k]
+        self.eq_b[as_points(self.net.g_p)[0]] = self._node_limit[o_k].sum()
+
+        node = np.arange(row)
+        w_entries = (node, self.variables.columns('w', node),
+                     np.ones(row, dtype=int))
+        self.eq_array = make_sparse(
+            [incidence(self.net, self.variables), w_entries],
+            (row, len(self.variables)))
+
+    def make_inequality(self, row):
+        """
+        station capacity rows: input flow of station is not more than its
+        limit
+        """
         self.ineq_b = np.zeros(row)
-        self.ineq_array = pd.DataFrame(data_ineq, columns=x + w)
-        for i in list(self.net.s_p.keys()):
-            self.add_input_edge_s(i, self.ineq_array)
-            self.ineq_b[i] = self._l[i]
+        self.ineq_b[self.net.s_first:] = self.limit
+        self.ineq_array = make_sparse(
+            [station_input(self.net, self.variables)],
+            (row, len(self.variables)))
 
-    def create_matrix(self):
+    def create_matrix(self, sparse=False, presolve=False, memory_budget=None):
         """
         Input matrices of task 1
 
+        :param sparse: keep equality and inequality matrices as scipy
+        sparse matrices instead of DataFrames
+        :param presolve: only variables of the network arcs between the
+        nodes which can carry flow from objects to the gateway, rows without
+        coefficients are dropped (eq_rows and ineq_rows keep the original
+        row numbers). expand_solution returns the solution in full naming.
+        :param memory_budget: bytes of the model (see
+        src.model_size.guard_memory): dense matrices over it are
+        replaced by sparse ones, ModelTooLargeError is raised if
+        the sparse model is over it too
         :return: equality matrix, linear equality constraint vector;
          inequality matrix, linear inequality constraint vector;
          upper bounds vector; lower bounds vector
         """
+        self.size = estimate_size(self.net, 'lppfs', presolve, False)
+        sparse = guard_memory(self.size, sparse, memory_budget)
         row_num = (len(self.net.g_p) + len(self.net.o_p) + len(self.net.s_p))
 
-        [x_name, w_name] = self.create_value(row_num)
+        keep = useful_nodes(self.net) if presolve else None
+        self.variables = self.create_value(row_num, keep)
+        self.make_objective()
 
-        self.make_objective(x_name, w_name)
-
-        _s_key = list(self.net.s_p.keys())
         # limit
-        _lim = list(j for i in [[k] * len(self.net.s_p)
-                                for k in self._lim] for j in i)
-        self.limit = {k + _s_key[0]: value
-                      for k, value in enumerate(_lim)}
-        self._l = {**self.g_lim, **self.o_lim, **self.limit}
-
-        self.make_equality(row_num, x_name, w_name)
-        self.make_inequality(row_num, x_name, w_name)
-
-
-def lppfs_solver():
-    draw_input_data(gate, obj, sta)
-    net = BSS(gate, obj, sta, sta_set)
-    net.create()
-
-    problem = LPPFS(net)
-    problem.create_matrix()
-    draw_lp_graph(net)
-
-    result = solve_lp_problem(problem.f.values,
-                              problem.ineq_array.values,
-                              problem.ineq_b,
-                              problem.eq_array.values,
-                              problem.eq_b,
-                              problem.lower_bounds,
-                              problem.upper_bounds,)
-
-    solution = pd.Series(result.x, index=problem.eq_array.columns.values)
-    draw_lp_graph(net)
+        self.limit = self.net.station_param('limit')
+        self._node_limit = node_limit(self.net)
+
+        with span('make_equality'):
+            self.make_equality(row_num)
+        with span('make_inequality'):
+            self.make_inequality(row_num)
+        self.eq_rows = np.arange(len(self.eq_b))
+        self.ineq_rows = np.arange(len(self.ineq_b))
+        if presolve:
+            with span('presolve'):
+                self.presolve(keep)
+        if not sparse:
+            names = self.variables.names()
+            self.eq_array = to_frame(self.eq_array, names)
+            self.ineq_array = to_frame(self.ineq_array, names)
+
+    def presolve(self, keep):
+        """
+        drop empty rows and report the model size reduction
+        :param keep: bool array of presolve kept nodes
+        """
+        s_num = len(self.net.s_p)
+        full_col = (len(self.net.o_p) * s_num + s_num * (s_num - 1) +
+                    s_num * len(self.net.g_p) + len(self.eq_b))
+        full_row = len(self.eq_b) + len(self.ineq_b)
+        self.eq_array, self.eq_b, self.eq_rows = drop_empty_rows(
+            self.eq_array, self.eq_b, equality=True)
+        self.ineq_array, self.ineq_b, self.ineq_rows = drop_empty_rows(
+            self.ineq_array, self.ineq_b, equality=False)
+        s_key = as_points(self.net.s_p)[0]
+        self.presolve_report = {
+            'columns': (full_col, len(self.variables)),
+            'rows': (full_row, len(self.eq_b) + len(self.ineq_b)),
+            'removed_stations': s_key[~keep[s_key]].tolist()}
+
+    def expand_solution(self, x):
+        """
+        :param x: solution vector of the model
+        :return: solution Series with names of the full (not presolved)
+        model, variables removed by presolve are 0
+        """
+        if self.presolve_report is None:
+            return pd.Series(x, index=self.variables.names())
+        full = self.create_value(self.net.node_num)
+        return pd.Series(expand(self.variables, full, x), index=full.names())
+
+
+def lppfs_solver(presolve=True, method='highs-ds', options=None,
+                 instance=None, cache=None):
+    """
+
+    :param presolve: presolve the model (see LPPFS.create_matrix)
+    :param method: LP method of solve_lp_problem or 'maxflow' - max-flow
+    feasibility check (integer limits only)
+    :param options: SolveOptions of the LP solver
+    :param instance: instance of src.instance.load_instance, default - the
+    input module of the task
+    :param cache: directory of the disk cache (see src.cache), the
+    network edges and the solution of the same input and options are not
+    built again
+    :return: lppfs solution
+    """
+    inputs = instance or {'gate': gate, 'obj': obj, 'sta': sta,
+                          'sta_type': sta_set}
+    with span('draw_input_data'):
+        draw_input_data(inputs['gate'], inputs['obj'], inputs['sta'])
+    store, key, hit = None, None, None
+    if cache is not None:
+        store = get_cache(cache)
+        key = run_key('lppfs', inputs, presolve, method, options)
+        hit = store.get(key)
+    with span('BSS.create'):
+        if hit is not None:
+            net = cached_network(inputs, hit)
+        else:
+            net = BSS(inputs['gate'], inputs['obj'], inputs['sta'],
+                      inputs['sta_type'])
+            net.create()
+        record(nodes=net.node_num, edges=int(net.adj_matrix.nnz),
+               cached=hit is not None)
+    if hit is not None:
+        with span('draw_lp_graph'):
+            draw_lp_graph(net)
+        return pd.Series(hit['values'], index=hit['names'])
+
+    with span('create_matrix'):
+        problem = LPPFS(net)
+        problem.create_matrix(sparse=True, presolve=presolve)
+        record(lambda: model_stats(problem))
+    with span('draw_lp_graph'):
+        draw_lp_graph(net)
+
+    with span('solve'):
+        record(solver=method)
+        if method == 'maxflow':
+            result = max_flow(net)
+            assert result.feasible, \
+                ('There is no solution because the max-flow {} is less '
+                 'than the demand {}, min-cut: {}'.format(
+                     result.value, result.demand, result.cut))
+            x = result.x(problem.variables)
+        else:
+            result = solve_lp_problem(problem.f,
+                                      matrix_values(problem.ineq_array),
+                                      problem.ineq_b,
+                                      matrix_values(problem.eq_array),
+                                      problem.eq_b,
+                                      problem.lower_bounds,
+                                      problem.upper_bounds,
+                                      method=method, options=options)
+            assert result.feasible, \
+                ('There is no solution because the '
+                 'objective function value of linear '
+                 'programing problem is not zero ({})'.format(
+                     result.message))
+            x = result.x
+
+    with span('expand_solution'):
+        solution = problem.expand_solution(x)
+    if store is not None:
+        store.put(key, run_record(net, solution))
+    with span('draw_lp_graph'):
+        draw_lp_graph(net)
 
     return solution
@@ -0,0 +1,193 @@
+"""
+Greedy placement heuristic of task 3: fast feasible placement of stations
+without MILP, as an approximate answer or an initial incumbent
+"""
+import time
+
+import numpy as np
+import scipy.sparse as sp
+
+from src.assembly import node_kind, OBJECT
+from src.flow import FlowNetwork
+from src.geometry import as_points, as_values
+from src.presolve import useful_nodes
+
+
+class Placement:
+    """
+    Placement of stations.
+    y - bool array, one per station node (s_p order), of placed stations,
+    cost - cost of placed stations,
+    flow - FlowResult of the placed stations
+    """
+    def __init__(self, net, y, flow):
+        self.net = net
+        self.y = y
+        self.flow = flow
+        self.cost = float(net.station_param('cost')[y].sum())
+
+    @property
+    def feasible(self):
+        return self.flow.feasible
+
+    @property
+    def nodes(self):
+        """ placed station nodes """
+        return np.flatnonzero(self.y) + self.net.s_first
+
+    def x(self, problem):
+        """
+        :param problem: MILPOP (or MILPPFS) problem after create_matrix
+        :return: solution vector of the problem: flows and y of the
+        placement (usable as MIP start)
+        :raise ValueError: placed stations were removed by presolve
+        """
+        y = problem.variables.columns('y', self.nodes)
+        if np.any(y < 0):
+            raise ValueError('Placed stations {} have no column in the '
+                             'presolved model'.format(
+                                 self.nodes[y < 0].tolist()))
+        x = self.flow.x(problem.variables)
+        x[y] = 1
+        return x
+
+    def __repr__(self):
+        return 'Placement(nodes={}, cost={}, feasible={})'.format(
+            self.nodes.tolist(), self.cost, self.feasible)
+
+
+def coverage_matrix(net):
+    """
+    :param net: BSS network after create()
+    :return: (object node, station) csc matrix of object2station edges
+    """
+    tails, heads = net.edges()
+    on = (node_kind(net)[tails] == OBJECT) & (heads >= net.s_first)
+    return sp.csc_matrix((np.ones(on.sum()),
+                          (tails[on], heads[on] - net.s_first)),
+                         shape=(net.s_first, net.node_num - net.s_first))
+
+
+def greedy_placement(net, time_limit=None):
+    """
+    1. place stations by the least cost per newly covered demand (not more
+    than the station limit) until all objects are covered;
+    2. while the demand can not be routed to the gateway, place (or change
+    the type of the placed one at its site) the station with the most
+    estimated max-flow gain per extra cost among the stations which open an
+    augmenting path in the residual graph (the cheapest one next to the
+    source side at a free site if none of them has a gain), only the
+    chosen station is checked by max-flow;
+    3. remove placed stations, the most expensive first, which are not
+    needed for the routing, or change them to the cheapest type which
+    keeps the routing.
+    One station type per site, as in MILPOP.add_y_condition.
+    :param net: BSS network after create()
+    :param time_limit: seconds, the routing or the clean up stops after it
+    and the placement found so far is returned (it may be infeasible)
+    :return: Placement, feasible is False if no placement is found
+    """
+    deadline = (None if time_limit is None else
+                time.monotonic() + time_limit)
+    s_num = net.node_num - net.s_first
+    cost = net.station_param('cost').astype(float)
+    site = np.arange(s_num) % net.site_num
+    useful = useful_nodes(net)[net.s_first:]
+    # placed station of every site, -1 - free site
+    occupant = np.full(net.site_num, -1)
+    y = np.zeros(s_num, dtype=bool)
+
+    def place(s):
+        if occupant[site[s]] >= 0:
+            y[occupant[site[s]]] = False
+        y[s] = True
+        occupant[site[s]] = s
+
+    # 1. coverage
+    cover = coverage_matrix(net)
+    limit = net.station_param('limit').astype(float)
+    uncovered = np.zeros(net.s_first)
+    o_k = as_points(net.o_p)[0]
+    uncovered[o_k] = as_values(net.o_lim, o_k)
+    while uncovered.any():
+        gain = np.minimum(cover.T @ uncovered, limit)
+        candidate = useful & (occupant[site] < 0) & (gain > 0)
+        if not candidate.any():
+            break
+        ratio = np.where(candidate, cost / np.maximum(gain, 1e-12), np.inf)
+        s = int(np.argmin(ratio))
+        place(s)
+        uncovered[cover[:, s].indices] = 0
+
+    # 2. routing
+    network = FlowNetwork(net)
+    flow = network.solve(y)
+    limit = network.limit.astype(float)
+    # type changes which gave no gain, they are not tried again (a station
+    # at a free site which opens an augmenting path always has a gain)
+    rejected = np.zeros(s_num, dtype=bool)
+    while not flow.feasible:
+        if deadline is not None and time.monotonic() > deadline:
+            return Placement(net, y, flow)
+        # candidates with an input arc from the source side of the
+        # residual graph, a station at a taken site replaces the placed
+        # type
+        candidate = flow.near & useful & ~y & ~rejected
+        other = occupant[site]
+        replaced = other >= 0
+        extra = cost - np.where(replaced, cost[np.maximum(other, 0)], 0)
+        # a station with an arc to the sink side opens an augmenting path,
+        # its gain is estimated by its capacity
+        gain = np.minimum(limit, flow.demand - flow.value)
+        scored = np.flatnonzero(candidate & flow.sink_near & (gain > 0))
+        ratio = gain[scored] / np.maximum(extra[scored], 1e-12)
+        placed = False
+        for s in scored[np.argsort(-ratio, kind='stable')].tolist():
+            trial_y = y.copy()
+            if replaced[s]:
+                trial_y[other[s]] = False
+            trial_y[s] = True
+            trial = network.solve(trial_y)
+            if trial.value > flow.value:
+                place(s)
+                flow, placed = trial, True
+                break
+            rejected[s] = True
+        free = candidate & ~replaced
+        if placed:
+            continue
+        if free.any():
+            # no gain of one station (e.g. chain of relays), place the
+            # cheapest one and extend the source side
+            place(int(np.flatnonzero(free)[np.argmin(cost[free])]))
+            flow = network.solve(y)
+        else:
+            return Placement(net, y, flow)
+
+    # 3. clean up: remove the station or change it to a cheaper type, a
+    # station without flow is removed without a max-flow
+    changed = False
+    for s in np.flatnonzero(y)[np.argsort(-cost[y], kind='stable')].tolist():
+        if deadline is not None and time.monotonic() > deadline:
+            break
+        if flow.through[s] == 0:
+            y = y.copy()
+            y[s] = False
+            changed = True
+            continue
+        same_site = np.flatnonzero((site == site[s]) & useful &
+                                   (cost < cost[s]))
+        for other in [None] + same_site[np.argsort(cost[same_site],
+                                                   kind='stable')].tolist():
+            trial_y = y.copy()
+            trial_y[s] = False
+            if other is not None:
+                trial_y[other] = True
+            if network.value(trial_y) == flow.demand:
+                # the flow is routed in other way, so is the flow through
+                # the next stations
+                y, flow, changed = trial_y, network.solve(trial_y), False
+                break
+    if changed:
+        flow = network.solve(y)
+    return Placement(net, y, flow)
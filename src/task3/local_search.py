@@ -0,0 +1,204 @@
+"""
+Local search of task 3: simulated annealing over station placements with
+add, drop and swap moves, for the networks too large for the MILP
+"""
+import multiprocessing
+import queue
+import time
+
+import numpy as np
+
+from src.flow import FlowNetwork
+from src.presolve import useful_nodes
+from src.task3.greedy import Placement, greedy_placement
+
+# final temperature of annealing as a part of the first one
+COOLING = 1e-3
+
+
+class Search:
+    """
+    Simulated annealing state. A placement is scored by its cost plus a
+    penalty for the demand which can not be routed (max-flow of the placed
+    stations), the penalty of one unit is more than the cost of all
+    stations, so every feasible placement is better than any infeasible.
+    The budget of run is counted from the creation of the state, so the
+    greedy start is a part of it.
+    """
+    def __init__(self, net, seed=None, start=None, time_limit=None):
+        """
+        :param net: BSS network after create()
+        :param seed: random seed
+        :param start: initial Placement, default - greedy placement
+        :param time_limit: time limit of the greedy placement, seconds
+        """
+        self.started = time.monotonic()
+        self.net = net
+        self.network = FlowNetwork(net)
+        self.rng = np.random.default_rng(seed)
+        self.cost = net.station_param('cost').astype(float)
+        self.site = np.arange(len(self.cost)) % net.site_num
+        self.useful = np.flatnonzero(useful_nodes(net)[net.s_first:])
+        self.penalty = self.cost[self.useful].sum() + 1
+
+        if start is None:
+            start = greedy_placement(net, time_limit)
+        self.y = start.y.copy()
+        self.flow = start.flow
+        self.score = self.get_score(self.y, self.flow)
+        self.best = start if start.feasible else None
+        self.temperature = (np.median(self.cost[self.useful])
+                            if len(self.useful) else 0)
+
+    def get_score(self, y, flow):
+        return self.cost[y].sum() + self.penalty * (flow.demand - flow.value)
+
+    def move(self):
+        """
+        random neighbour placement: add a station at a free site, drop a
+        placed station or swap a placed station for another useful one (a
+        different type at its site or a station at a free site)
+        :return: new y, move kind, changed station
+        """
+        y = self.y.copy()
+        placed = np.flatnonzero(y)
+        taken = np.zeros(self.net.site_num, dtype=bool)
+        taken[self.site[placed]] = True
+        free = self.useful[~taken[self.site[self.useful]]]
+        moves = (['add'] * bool(len(free)) + ['drop', 'swap'] *
+                 bool(len(placed)))
+        if not moves:
+            return y, None, None
+        kind = moves[self.rng.integers(len(moves))]
+        if kind == 'add':
+            s = self.rng.choice(free)
+            y[s] = True
+            return y, kind, s
+        s = self.rng.choice(placed)
+        y[s] = False
+        if kind == 'swap':
+            other = self.useful[(self.useful != s) &
+                                (~taken[self.site[self.useful]] |
+                                 (self.site[self.useful] == self.site[s]))]
+            if len(other):
+                y[self.rng.choice(other)] = True
+        return y, kind, s
+
+    def check(self, y, kind, s):
+        """
+        flow of the new placement: a feasible flow stays feasible when a
+        station is added or a station without flow is dropped, otherwise
+        max-flow is computed
+        """
+        flow = self.flow
+        if flow.feasible and kind == 'add':
+            return flow
+        if flow.feasible and kind == 'drop' and not np.any(
+                flow.flow[flow.heads == s + self.net.s_first]):
+            return flow
+        return self.network.solve(y)
+
+    def step(self, temperature):
+        """
+        one move, accepted if it is better or with the annealing probability
+        :return: True if the best placement is improved
+        """
+        y, kind, s = self.move()
+        flow = self.check(y, kind, s)
+        score = self.get_score(y, flow)
+        delta = score - self.score
+        if delta <= 0 or (temperature > 0 and self.rng.random() <
+                          np.exp(-delta / temperature)):
+            self.y, self.flow, self.score = y, flow, score
+            if flow.feasible and (self.best is None or
+                                  score < self.best.cost):
+                self.best = Placement(self.net, y, flow)
+                return True
+        return False
+
+    def run(self, budget, max_iter=None):
+        """
+        anneal until budget seconds since the creation pass (or max_iter
+        moves)
+        :param budget: wall-clock budget, seconds
+        :param max_iter: move limit
+        :return: generator of the improving feasible Placements, the first
+        is the start placement if it is feasible
+        """
+        if self.best is not None:
+            yield self.best
+        iteration = 0
+        while max_iter is None or iteration < max_iter:
+            part = ((time.monotonic() - self.started) / budget
+                    if budget > 0 else 1)
+            if part >= 1:
+                return
+            if max_iter is not None:
+                part = max(part, iteration / max_iter)
+            if self.step(self.temperature * COOLING ** part):
+                yield self.best
+            iteration += 1
+
+
+def local_search(net, budget, seed=None, start=None, max_iter=None):
+    """
+    :param net: BSS network after create()
+    :param budget: wall-clock budget, seconds, the greedy start included
+    :param seed: random seed
+    :param start: initial Placement, default - greedy placement
+    :param max_iter: move limit
+    :return: generator of the improving feasible Placements
+    """
+    return Search(net, seed, start, budget).run(budget, max_iter)
+
+
+def _worker(net, budget, seed, start, max_iter, results):
+    try:
+        for placement in local_search(net, budget, seed, start, max_iter):
+            results.put((seed, placement.nodes.tolist()))
+    finally:
+        results.put((seed, None))
+
+
+def parallel_search(net, budget, seeds=(0, 1, 2, 3), max_iter=None):
+    """
+    Local search with different seeds in parallel processes, all of them
+    start from one greedy placement computed here
+    :param net: BSS network after create()
+    :param budget: wall-clock budget, seconds, the greedy start included
+    :param seeds: random seed of every process
+    :param max_iter: move limit of every process
+    :return: generator of (seed, Placement), only the placements better
+    than all found before are yielded
+    """
+    deadline = time.monotonic() + budget
+    network = FlowNetwork(net)
+    start = greedy_placement(net, budget)
+    left = max(deadline - time.monotonic(), 0)
+    results = multiprocessing.Queue()
+    workers = [multiprocessing.Process(
+        target=_worker, args=(net, left, seed, start, max_iter, results),
+        daemon=True) for seed in seeds]
+    for worker in workers:
+        worker.start()
+    running = len(workers)
+    best = None
+    try:
+        while running:
+            try:
+                seed, nodes = results.get(
+                    timeout=max(deadline - time.monotonic(), 0) + 60)
+            except queue.Empty:
+                return
+            if nodes is None:
+                running -= 1
+                continue
+            y = np.zeros(net.node_num - net.s_first, dtype=bool)
+            y[np.asarray(nodes, dtype=int) - net.s_first] = True
+            placement = Placement(net, y, network.solve(y))
+            if best is None or placement.cost < best.cost:
+                best = placement
+                yield seed, placement
+    finally:
+        for worker in workers:
+            worker.terminate()
@@ -1,14 +1,21 @@
 """
 Mixed-integer linear programming problem feasible solution
 """
-from itertools import product
-from itertools import permutations
-
 from problem.milpop_input import gate, obj, sta, sta_type
 from src.network import BSS
 from src.draw import draw_input_data, draw_milp_graph
-import src.matlab.milp_problem
-import src.gurobi.milp_problem
+from src.assembly import (candidate_arcs, incidence, station_input,
+                          object_linking, make_sparse, to_frame,
+                          matrix_values, node_limit)
+from src.geometry import as_points
+from src.variables import VariableIndex
+from src.presolve import (useful_nodes, dominated_stations, presolve_arcs,
+                          drop_empty_rows, expand, throughput)
+from src.task3.greedy import greedy_placement
+from src.lp_problem import solve_lp_problem
+from src.cache import get_cache, run_key, run_record, cached_network
+from src.model_size import estimate_size, guard_memory
+from src.profiling import span, record, model_stats
 
 import pandas as pd
 import numpy as np
@@ -18,20 +25,21 @@ class MILPOP:
     """ Mixed-integer linear programming optimization problem"""
     def __init__(self, network):
         self.net = network
-        self.adj_mat = network.adj_matrix.toarray()
 
-        self.g_lim = gate['lim']
-        self.o_lim = obj['lim']
+        self.g_lim = network.g_lim
+        self.o_lim = network.o_lim
         self.limit = None
         self.cost = None
 
-        self._cost = [sta_type[i + 1]['cost']
-                      for i in range(len(sta_type))]
-        self._lim = [sta_type[i + 1]['limit']
-                     for i in range(len(sta_type))]
-        self._common_limit = None
+        self._cost = [network.sta_type[i + 1]['cost']
+                      for i in range(network.type_num)]
+        self._lim = [network.sta_type[i + 1]['limit']
+                     for i in range(network.type_num)]
+        self._node_limit = None
+        self._throughput = None
         self._y_index = None
 
+        self.variables = None
         self.f = None
         self.int_constraints = None
         self.lower_bounds = None
@@ -40,232 +48,328 @@ class MILPOP:
         self.eq_b = None
         self.ineq_array = None
         self.ineq_b = None
+        self.eq_rows = None
+        self.ineq_rows = None
+        self.presolve_report = None
+        self.size = None
+        self._y_name = None
 
-    @staticmethod
-    def value_name(name, edge_name):
-        return [name + '_'.join(map(str, edge_name[i]))
-                for i in range(len(edge_name))]
-
-    def create_edge(self):
-        # g_k = ''.join(map(str, list(self.net.g_p.keys())))
-        # o_k = ''.join(map(str, list(self.net.o_p.keys())))
-        # s_k = ''.join(map(str, list(self.net.s_p.keys())))
-        g_k = list(map(str, self.net.g_p.keys()))
-        o_k = list(map(str, self.net.o_p.keys()))
-        s_k = list(map(str, self.net.s_p.keys()))
-
-        o_s = [i for i in product(o_k, s_k)]
-        s_s = [i for i in permutations(s_k, 2)]
-        s_g = [i for i in product(s_k, g_k)]
-
-        o_s_name = self.value_name('x', o_s)
-        s_s_name = self.value_name('x', s_s)
-        s_g_name = self.value_name('x', s_g)
-
-        return o_s_name + s_s_name + s_g_name
-
-    def create_value(self, w_num):
-        x = self.create_edge()
-        y = ['y' + str(i) for i in self.net.s_p.keys()]
-        w = ['w' + str(i) for i in range(w_num)]
-
-        return [x, y, w]
-
-    def make_objective(self, x, y):
+    def create_value(self, keep=None):
+        """
+        x: object2station, station2station and station2gateway arcs,
+        y: one per station node
+        :param keep: bool array of presolve kept nodes, then x are only the
+        arcs of the network between kept nodes and y are kept stations
+        :return: VariableIndex
+        """
+        variables = VariableIndex(self.net.node_num)
+        s_key = as_points(self.net.s_p)[0]
+        if keep is None:
+            variables.add_arcs('x', *candidate_arcs(self.net))
+            variables.add_nodes('y', s_key)
+        else:
+            variables.add_arcs('x', *presolve_arcs(self.net, keep))
+            variables.add_nodes('y', s_key[keep[s_key]])
+        return variables
+
+    def make_objective(self):
         """
         make objective function
-        :param x: name of edge parameter vector
-        :param y: name of bool parameter vector
         :return: self.f
         """
-        col = x + y
-        data = np.zeros([1, len(col)]).astype(int)
-        self.f = pd.DataFrame(data, columns=col)
-        column, = np.where(np.in1d(self.f.columns.values, y))
+        col_num = len(self.variables)
+        self.f = np.zeros([1, col_num])
+        y = self.variables.block('y')
+        self._y_index = np.arange(y.start, y.stop)
         # Cost * y -> min
+        self.f[0, self._y_index] = self.cost[self.variables.keys('y')[0] -
+                                             self.net.s_first]
 
-        # Objective function consist on only w values
-        self.f.iloc[0, column] = list(self.cost.values())
+        self.lower_bounds = np.zeros([1, col_num])
+        self.upper_bounds = np.full([1, col_num], np.inf)
 
-        self.lower_bounds = np.zeros([1, len(col)]).astype(int)
-        self.upper_bounds = np.ones([1, len(col)]).astype(int) * np.inf
-
-        self._y_index, = np.where(np.in1d(self.f.columns.values, y))
         self.upper_bounds[0, self._y_index] = 1
         # because index start from 1 not 0 in Matlab Optimization Toolbox
         self.int_constraints = [i + 1 for i in self._y_index.tolist()]
 
-    def make_for_g(self, i):
-        adj_mat_r, = np.where(self.adj_mat[:, i] == 1)
-        adj_mat_r_name = ['x' + str(adj_mat_r[j]) + '_' +
-                          str(i) for j in range(len(adj_mat_r))]
-
-        column, = np.where(np.in1d(self.eq_array.columns.values,
-                                   adj_mat_r_name))
-        self.eq_array.iloc[i, column] = 1
-        self.eq_b[i] = sum(self._common_limit[j]
-                           for j in list(self.net.o_p.keys()))
-
-    def make_for_o(self, i):
-        adj_mat_c, = np.where(self.adj_mat[i, :] == 1)
-        adg_mat_c_name = ['x' + str(i) + '_' +
-                          str(adj_mat_c[j]) for j in range(len(adj_mat_c))]
-
-        column, = np.where(np.in1d(self.eq_array.columns.values,
-                                   adg_mat_c_name))
-        self.eq_array.iloc[i, column] = 1
-        self.eq_b[i] = self._common_limit[i]
-
-    def add_input_edge_s(self, i, array):
-        row_mat, = np.where(self.adj_mat[:, i] == 1)
-        mat_name_plus = ['x' + str(row_mat[j]) + '_' + str(i)
-                         for j in range(len(row_mat))]
-
-        column_plus, = np.where(np.in1d(array.columns.values,
-                                        mat_name_plus))
-        array.iloc[i, column_plus] = 1
-
-    def make_for_s(self, i):
-
-        self.add_input_edge_s(i, self.eq_array)
-
-        col_mat, = np.where(self.adj_mat[i, :] == 1)
-        mat_name_minus = ['x' + str(i) + '_' + str(col_mat[j])
-                          for j in range(len(col_mat))]
-        column_minus, = np.where(np.in1d(self.eq_array.columns.values,
-                                         mat_name_minus))
-        self.eq_array.iloc[i, column_minus] = -1
-        self.eq_b[i] = 0
-
-    def make_equality(self, row, x, y):
-        data_eq = np.zeros([row, len(x+y)]).astype(int)
+    def make_equality(self, row):
+        """
+        flow conservation rows: gateway gets the demand of all objects,
+        object sends its demand, station sends all it gets
+        """
         self.eq_b = np.zeros(row)
-        self.eq_array = pd.DataFrame(data_eq, columns=x+y)
-
-        for i in range(row):
-            if i in list(self.net.g_p.keys()):
-                self.make_for_g(i)
-
-            if i in list(self.net.o_p.keys()):
-                self.make_for_o(i)
-
-            if i in list(self.net.s_p.keys()):
-                self.make_for_s(i)
+        o_k = as_points(self.net.o_p)[0]
+        self.eq_b[o_k] = self._node_limit[o_k]
+        self.eq_b[as_points(self.net.g_p)[0]] = self._node_limit[o_k].sum()
+        self.eq_array = make_sparse([incidence(self.net, self.variables)],
+                                    (row, len(self.variables)))
 
-    def add_y_condition(self, row, y):
+    def add_y_condition(self, row):
         """
 
-        :param row:condition columns that a station of the same type can be
-        used only once. After row2: columns of the condition that only one
+        :param row: columns of the condition that only one
         station can be located at the location
-        :param y: y name
-        :return:
+        :return: rows, cols, vals arrays
         """
         # ai ∈ Dj
-        _s_p_num = int(len(self.net.s_p) / len(self._lim))
-        for k in range(0, _s_p_num):
-            y_name = [y[k + j * _s_p_num] for j in range(0, len(self._lim))]
-            column, = np.where(np.in1d(self.ineq_array.columns.values, y_name))
-            self.ineq_array.iloc[row+k, column] = 1
-            self.ineq_b[row+k] = 1
+        _s_p_num = self.net.site_num
+        y_num = len(self._y_index)
+        k = (self.variables.keys('y')[0] - self.net.s_first) % _s_p_num
+        self.ineq_b[row:row + _s_p_num] = 1
+        return row + k, self._y_index, np.ones(y_num, dtype=int)
 
-        # for i in range(0, len(self._lim)):
-        #     y_1 = [y[j+i*_s_p_num] for j in range(0, _s_p_num)]
-        #     # column, = np.where(np.in1d(self.ineq_array.columns.values,y_1))
-        #     # self.ineq_array.iloc[row1 + i, column] = 1
-        #     # self.ineq_b[row1 + i] = 1
-        # # ai ∈ Dj
-        # row2 = row1 + i
-        # for k in range(0, _s_p_num):
-        #     y_2 = [y[k+j*_s_p_num] for j in range(0, len(self._lim))]
-        #     column, = np.where(np.in1d(self.ineq_array.columns.values, y_2))
-        #     self.ineq_array.iloc[row2+k+1, column] = 1
-        #     self.ineq_b[row2+k+1] = 1
-
-    def make_inequality(self, row, x, y):
-        ineq_row = (row + int(len(self.net.s_p) / len(self._lim)))
-        data_ineq = np.zeros([ineq_row, len(x+y)]).astype(int)
+    def make_inequality(self, row):
+        """
+        station capacity rows: input flow of station i is not more than
+        limit * y_i, then the rows of add_y_condition and, if the model is
+        tightened, the rows of object_linking
+        """
+        ineq_row = (row + self.net.site_num)
+        linking = []
+        if self._throughput is not None:
+            (l_row, l_col, l_val), l_num = object_linking(
+                self.net, self.variables, self._throughput)
+            linking.append((l_row + ineq_row, l_col, l_val))
+            ineq_row += l_num
         self.ineq_b = np.zeros(ineq_row)
-        self.ineq_array = pd.DataFrame(data_ineq, columns=x+y)
-        for i in list(self.net.s_p.keys()):
-            self.add_input_edge_s(i, self.ineq_array)
-            coef = -1 * self._common_limit[i]
-            column, = np.where(np.in1d(self.ineq_array.columns.values,
-                                       'y' + str(i)))
-            self.ineq_array.iloc[i, column] = coef
-            # self.ineq_b[i] = self._common_limit[i]
-        self.add_y_condition(row, y)
-
-    def create_matrix(self):
+        s_key = as_points(self.net.s_p)[0]
+        coef = -1 * self.limit
+        if self._throughput is not None:
+            coef = -1 * self._throughput[s_key]
+        limit_entries = (s_key, self.variables.columns('y', s_key), coef)
+        self.ineq_array = make_sparse(
+            [station_input(self.net, self.variables), limit_entries,
+             self.add_y_condition(row)] + linking,
+            (ineq_row, len(self.variables)))
+
+    def create_matrix(self, sparse=False, presolve=False, tighten=False,
+                      memory_budget=None, dominance=False):
         """
-        Input matrices of task 1
-
+        Input matrices of task 3
+
+        :param sparse: keep equality and inequality matrices as scipy
+        sparse matrices instead of DataFrames
+        :param presolve: only variables of the network arcs between the
+        nodes which can carry flow from objects to the gateway (y of the
+        removed stations is 0), rows without coefficients are dropped
+        (eq_rows and ineq_rows keep the original row numbers).
+        expand_solution returns the solution in full naming.
+        :param tighten: finite upper bounds of x, big-M of the station
+        capacity rows and object2station linking rows from the throughput
+        of the nodes (see src.presolve.throughput), valid only for the
+        demand of the network
+        :param memory_budget: bytes of the model (see
+        src.model_size.guard_memory): dense matrices over it are
+        replaced by sparse ones, ModelTooLargeError is raised if
+        the sparse model is over it too
+        :param dominance: with presolve, also remove the stations dominated
+        by another station type at their site (see
+        src.presolve.dominated_stations). The model is valid only for the
+        costs and limits it is built with and greedy placements can not
+        be its solutions.
         :return: equality matrix, linear equality constraint vector;
          inequality matrix, linear inequality constraint vector;
          upper bounds vector; lower bounds vector
         """
+        self.size = estimate_size(self.net, 'milpop', presolve, tighten)
+        sparse = guard_memory(self.size, sparse, memory_budget)
         row_num = (len(self.net.g_p) + len(self.net.o_p) + len(self.net.s_p))
-        [x_name, y_name, _] = self.create_value(row_num)
+        keep = None
+        if presolve:
+            useful = useful_nodes(self.net)
+            dominated = (dominated_stations(self.net) if dominance
+                         else np.zeros(self.net.node_num, dtype=bool))
+            keep = useful & ~dominated
+        self.variables = self.create_value(keep)
         # cost
-        _s_key = list(self.net.s_p.keys())
-        _cost = list(j for i in [[k] * int(len(self.net.s_p) / len(self._cost))
-                                 for k in self._cost] for j in i)
-        self.cost = {k + _s_key[0]: value
-                     for k, value in enumerate(_cost)}
+        self.cost = self.net.station_param('cost')
 
-        self.make_objective(x_name, y_name)
+        self.make_objective()
         # limit
-        _lim = list(j for i in [[k] * int(len(self.net.s_p)/len(self._lim))
-                                for k in self._lim] for j in i)
-        self.limit = {k + _s_key[0]: value
-                      for k, value in enumerate(_lim)}
-        self._common_limit = {**self.g_lim, **self.o_lim, **self.limit}
-
-        self.make_equality(row_num, x_name, y_name)
-        self.make_inequality(row_num, x_name, y_name)
+        self.limit = self.net.station_param('limit')
+        self._node_limit = node_limit(self.net)
+        if tighten:
+            self._throughput = throughput(self.net)
+            tails, heads = self.variables.keys('x')
+            self.upper_bounds[0, self.variables.block('x')] = np.minimum(
+                self._throughput[tails], self._throughput[heads])
+
+        with span('make_equality'):
+            self.make_equality(row_num)
+        with span('make_inequality'):
+            self.make_inequality(row_num)
+        self.eq_rows = np.arange(len(self.eq_b))
+        self.ineq_rows = np.arange(len(self.ineq_b))
+        if presolve:
+            with span('presolve'):
+                self.presolve(keep)
+            self.presolve_report['useless_stations'] = np.flatnonzero(
+                ~useful).tolist()
+            self.presolve_report['dominated_stations'] = np.flatnonzero(
+                useful & dominated).tolist()
+        if not sparse:
+            names = self.variables.names()
+            self.eq_array = to_frame(self.eq_array, names)
+            self.ineq_array = to_frame(self.ineq_array, names)
+
+    def presolve(self, keep):
+        """
+        drop empty rows and report the model size reduction
+        :param keep: bool array of presolve kept nodes
+        """
+        s_num = len(self.net.s_p)
+        full_col = (len(self.net.o_p) * s_num + s_num * (s_num - 1) +
+                    s_num * len(self.net.g_p) + s_num)
+        full_row = len(self.eq_b) + len(self.ineq_b)
+        self.eq_array, self.eq_b, self.eq_rows = drop_empty_rows(
+            self.eq_array, self.eq_b, equality=True)
+        self.ineq_array, self.ineq_b, self.ineq_rows = drop_empty_rows(
+            self.ineq_array, self.ineq_b, equality=False)
+        s_key = as_points(self.net.s_p)[0]
+        self.presolve_report = {
+            'columns': (full_col, len(self.variables)),
+            'rows': (full_row, len(self.eq_b) + len(self.ineq_b)),
+            'removed_stations': s_key[~keep[s_key]].tolist()}
 
     def get_solution_col_name(self):
-        row_num = (len(self.net.g_p) + len(self.net.o_p) + len(self.net.s_p))
-        [_, y_name, _] = self.create_value(row_num)
-
-        _s_p_num = int(len(self.net.s_p) / len(self._lim))
+        _s_p_num = self.net.site_num
 
-        _s_key = list(self.net.s_p.keys())
-        name = ['y' + str(_s_key[0]+j) + 's' + str(i+1)
+        name = ['y' + str(self.net.s_first + j) + 's' + str(i+1)
                 for i in range(0, len(self._lim))
                 for j in range(0, _s_p_num)]
-        column, = np.where(np.in1d(self.f.columns.values, y_name))
-        self.f.columns.values[column] = name
+        self._y_name = name
+        y_node = self.variables.keys('y')[0] - self.net.s_first
+        self.variables.rename('y', [name[i] for i in y_node.tolist()])
         return name
 
+    def expand_solution(self, x):
+        """
+        :param x: solution vector of the model
+        :return: solution Series with names of the full (not presolved)
+        model, variables removed by presolve are 0
+        """
+        if self.presolve_report is None:
+            return pd.Series(x, index=self.variables.names())
+        full = self.create_value()
+        if self._y_name is not None:
+            full.rename('y', self._y_name)
+        return pd.Series(expand(self.variables, full, x), index=full.names())
+
 
-def get_milpop_solution(solver='gurobi'):
+def relaxation_gap(net, presolve=True):
+    """
+    LP relaxation bound and gap of the model without and with tightening
+    :param net: BSS network after create()
+    :param presolve: presolve the models
+    :return: {'optimum': MILP optimum, 'lp_bound': (before, after),
+    'gap': (before, after)}, gap = (optimum - lp_bound) / optimum
+    """
+    import src.highs.milp_problem
+
+    report = {'lp_bound': [], 'gap': []}
+    for tighten in (False, True):
+        problem = MILPOP(net)
+        problem.create_matrix(sparse=True, presolve=presolve,
+                              tighten=tighten)
+        lp = solve_lp_problem(problem.f, problem.ineq_array, problem.ineq_b,
+                              problem.eq_array, problem.eq_b,
+                              problem.lower_bounds, problem.upper_bounds)
+        report['lp_bound'].append(lp.objective)
+    x = src.highs.milp_problem.solve(problem)
+    optimum = float(np.ravel(problem.f) @ x)
+    report['optimum'] = optimum
+    report['gap'] = tuple((optimum - bound) / abs(optimum) if optimum else 0
+                          for bound in report['lp_bound'])
+    report['lp_bound'] = tuple(report['lp_bound'])
+    return report
+
+
+def get_milpop_solution(solver='gurobi', presolve=True, greedy_start=False,
+                        options=None, instance=None, dominance=False,
+                        cache=None):
     """
 
+    :param solver: 'gurobi', 'matlab', 'highs' or 'greedy' (greedy
+    placement heuristic, approximate solution)
+    :param presolve: presolve the model (see MILPOP.create_matrix)
+    :param greedy_start: start gurobi or highs from the greedy placement
+    :param options: SolveOptions (time limit, gaps, incumbent callback)
+    :param instance: instance of src.instance.load_instance, default - the
+    input module of the task
+    :param dominance: presolve removes dominated stations (see
+    MILPOP.create_matrix), not with solver='greedy' or greedy_start
+    :param cache: directory of the disk cache (see src.cache), the
+    network edges and the solution of the same input and options are not
+    built again (the callback of options is not called then)
     :return: milppfs solution
     """
-    draw_input_data(gate, obj, sta)
-    net = BSS(gate, obj, sta, sta_type)
-    net.create()
-    problem = MILPOP(net)
-    problem.create_matrix()
-    y_solution = problem.get_solution_col_name()
-    if solver == 'gurobi':
-        x = src.gurobi.milp_problem.solve(problem)
-        # x = src.matlab.milp_problem.solve
-    else:
-        x = src.matlab.milp_problem.solve(problem.f.values,
-                                          problem.int_constraints,
-                                          problem.ineq_array.values,
-                                          problem.ineq_b,
-                                          problem.eq_array.values,
-                                          problem.eq_b,
-                                          problem.lower_bounds,
-                                          problem.upper_bounds)
-    solution = pd.Series(x, index=problem.f.columns.values).T
-    placed_station = solution[y_solution].values
-    placed_station.tolist()
-    draw_milp_graph(net, placed_station, y_solution)
+    inputs = instance or {'gate': gate, 'obj': obj, 'sta': sta,
+                          'sta_type': sta_type}
+    with span('draw_input_data'):
+        draw_input_data(inputs['gate'], inputs['obj'], inputs['sta'])
+    store, key, hit = None, None, None
+    if cache is not None:
+        store = get_cache(cache)
+        key = run_key('milpop', inputs, presolve, solver, greedy_start,
+                      dominance, options)
+        hit = store.get(key)
+    with span('BSS.create'):
+        if hit is not None:
+            net = cached_network(inputs, hit)
+        else:
+            net = BSS(inputs['gate'], inputs['obj'], inputs['sta'],
+                      inputs['sta_type'])
+            net.create()
+        record(nodes=net.node_num, edges=int(net.adj_matrix.nnz),
+               cached=hit is not None)
+    if hit is not None:
+        solution = pd.Series(hit['values'], index=hit['names'])
+        y_solution = hit['y_names'].tolist()
+        with span('draw_milp_graph'):
+            draw_milp_graph(net, solution[y_solution].values, y_solution)
+        return solution
+    with span('create_matrix'):
+        problem = MILPOP(net)
+        problem.create_matrix(presolve=presolve, dominance=dominance)
+        record(lambda: model_stats(problem))
+    with span('get_solution_col_name'):
+        y_solution = problem.get_solution_col_name()
+    start = None
+    if solver == 'greedy' or greedy_start:
+        with span('greedy_placement'):
+            placement = greedy_placement(net)
+            assert placement.feasible, 'Greedy placement is not found'
+            start = placement.x(problem)
+    with span('solve'):
+        record(solver=solver)
+        if solver == 'greedy':
+            x = start
+        elif solver == 'gurobi':
+            import src.gurobi.milp_problem
+            x = src.gurobi.milp_problem.solve(problem, start=start,
+                                              options=options)
+        elif solver == 'highs' and start is not None:
+            from src.highs.model import Model
+            model = Model(problem)
+            model.set_start(start)
+            x = model.solve(options=options).x
+        elif solver == 'highs':
+            import src.highs.milp_problem
+            x = src.highs.milp_problem.solve(problem, options=options)
+        else:
+            import src.matlab.milp_problem
+            x = src.matlab.milp_problem.solve(
+                problem.f, problem.int_constraints,
+                matrix_values(problem.ineq_array), problem.ineq_b,
+                matrix_values(problem.eq_array), problem.eq_b,
+                problem.lower_bounds, problem.upper_bounds, options=options)
+    with span('expand_solution'):
+        solution = problem.expand_solution(x).T
+        placed_station = solution[y_solution].values
+    if store is not None:
+        store.put(key, run_record(net, solution, y_solution))
+    with span('draw_milp_graph'):
+        draw_milp_graph(net, placed_station, y_solution)
     return solution
 
 
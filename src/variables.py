@@ -0,0 +1,134 @@
+"""
+Registry of model variables
+"""
+import numpy as np
+
+
+class VariableIndex:
+    """
+    Variables of a model as contiguous blocks of integer columns:
+    'x' - arc (tail, head) flows, 'y' - placed station selectors and
+    'w' - artificial values of rows, one per node.
+    Columns are found by (kind, tail, head) without building names, names
+    are made only on demand for reporting.
+    """
+    def __init__(self, node_num):
+        self.node_num = node_num
+        self.size = 0
+        self.blocks = {}
+        self._keys = {}
+        self._codes = {}
+        self._order = {}
+        self._names = {}
+        self._lookup = {}
+
+    def __len__(self):
+        return self.size
+
+    def add_arcs(self, kind, tails, heads):
+        """
+        add block of arc variables
+        :param kind: block name
+        :param tails: tail node array
+        :param heads: head node array
+        :return: slice of block columns
+        """
+        tails = np.asarray(tails, dtype=np.int64)
+        heads = np.asarray(heads, dtype=np.int64)
+        return self._add(kind, (tails, heads), tails * self.node_num + heads)
+
+    def add_nodes(self, kind, nodes):
+        """
+        add block of node variables
+        :param kind: block name
+        :param nodes: node array
+        :return: slice of block columns
+        """
+        nodes = np.asarray(nodes, dtype=np.int64)
+        return self._add(kind, (nodes,), nodes)
+
+    def _add(self, kind, keys, codes):
+        if kind in self.blocks:
+            raise ValueError('Variable block {!r} already exists'
+                             .format(kind))
+        block = slice(self.size, self.size + len(codes))
+        self.blocks[kind] = block
+        self._keys[kind] = keys
+        self._order[kind] = np.argsort(codes, kind='stable')
+        self._codes[kind] = codes[self._order[kind]]
+        self.size = block.stop
+        return block
+
+    def block(self, kind):
+        """ slice of block columns """
+        return self.blocks[kind]
+
+    def keys(self, kind):
+        """ (tails, heads) of arc block or (nodes,) of node block """
+        return self._keys[kind]
+
+    def columns(self, kind, tails, heads=None):
+        """
+        vectorized column search
+        :param kind: block name
+        :param tails: tail node array (node array for node blocks)
+        :param heads: head node array of arc blocks
+        :return: column array, -1 for unknown variables
+        """
+        codes = np.asarray(tails, dtype=np.int64)
+        if heads is not None:
+            codes = codes * self.node_num + np.asarray(heads, dtype=np.int64)
+        sorted_codes = self._codes[kind]
+        if not len(sorted_codes):
+            return np.full(np.shape(codes), -1, dtype=np.int64)
+        pos = np.searchsorted(sorted_codes, codes)
+        pos = np.minimum(pos, len(sorted_codes) - 1)
+        found = sorted_codes[pos] == codes
+        column = self.blocks[kind].start + self._order[kind][pos]
+        return np.where(found, column, -1)
+
+    def map_to(self, other):
+        """
+        columns of the variables of this registry in other registry
+        (e.g. presolved model in full model)
+        :return: column array, -1 for variables which other has not
+        """
+        columns = [other.columns(kind, *self._keys[kind])
+                   for kind in self.blocks]
+        return np.concatenate(columns) if columns else np.empty(0, dtype=int)
+
+    def index(self, kind, tail, head=None):
+        """
+        column of one variable, O(1) dict lookup
+        :return: column, KeyError for unknown variable
+        """
+        if kind not in self._lookup:
+            keys = zip(*(k.tolist() for k in self._keys[kind]))
+            if len(self._keys[kind]) == 1:
+                keys = (k[0] for k in keys)
+            self._lookup[kind] = {key: self.blocks[kind].start + i
+                                  for i, key in enumerate(keys)}
+        return self._lookup[kind][tail if head is None else (tail, head)]
+
+    def rename(self, kind, names):
+        """ set report names of a block """
+        if len(names) != len(self._keys[kind][0]):
+            raise ValueError('{} names for block {!r} of {} variables'.format(
+                len(names), kind, len(self._keys[kind][0])))
+        self._names[kind] = list(names)
+
+    def names(self, kind=None):
+        """
+        report names: 'x<tail>_<head>' for arcs, '<kind><node>' for nodes
+        :param kind: block name, default - all blocks
+        :return: list of names
+        """
+        if kind is None:
+            return [name for k in self.blocks for name in self.names(k)]
+        if kind in self._names:
+            return list(self._names[kind])
+        keys = self._keys[kind]
+        if len(keys) == 2:
+            return ['{}{}_{}'.format(kind, t, h)
+                    for t, h in zip(keys[0].tolist(), keys[1].tolist())]
+        return ['{}{}'.format(kind, i) for i in keys[0].tolist()]
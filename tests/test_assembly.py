@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+
+from problem.lppfs_input import gate, obj, sta, sta_set
+from src.network import BSS
+from src.task1.lppfs import LPPFS
+from src.task3.milpop import MILPOP
+from src.presolve import useful_nodes, dominated_stations, reduce_catalog
+import src.highs.milp_problem
+from src.highs.model import Model
+from src.task3.greedy import Placement
+from src.flow import max_flow
+
+net = BSS(gate, obj, sta, sta_set)
+net.create()
+
+
+def test_sparse_matrix():
+    """ sparse assembly gives the same matrices as DataFrames """
+    dense = LPPFS(net)
+    dense.create_matrix()
+    sparse = LPPFS(net)
+    sparse.create_matrix(sparse=True)
+    assert np.array_equal(sparse.eq_array.toarray(), dense.eq_array.values)
+    assert np.array_equal(sparse.ineq_array.toarray(),
+                          dense.ineq_array.values)
+    assert np.array_equal(sparse.eq_b, dense.eq_b)
+    assert np.array_equal(sparse.ineq_b, dense.ineq_b)
+
+
+def test_float_cost():
+    """ station costs are not truncated in the objective """
+    types = {t: dict(v, cost=10.7 * t) for t, v in sta_set.items()}
+    costed = BSS(gate, obj, sta, types)
+    costed.create()
+    problem = MILPOP(costed)
+    problem.create_matrix(sparse=True)
+    assert np.allclose(np.unique(problem.f[0, problem._y_index]),
+                       [10.7 * t for t in types])
+
+
+def test_flow_conservation():
+    """ every edge leaves one row and enters another """
+    problem = LPPFS(net)
+    problem.create_matrix(sparse=True)
+    x_num = problem.f.shape[1] - net.node_num
+    used = np.asarray(abs(problem.eq_array[:, :x_num]).sum(axis=0)).ravel()
+    assert used.sum() == 2 * net.adj_matrix.nnz
+
+
+def test_presolve():
+    """ presolve drops the station far from all nodes """
+    far_sta = {'pos': {**sta['pos'], 4: (50, 50)}}
+    far = BSS(gate, obj, far_sta, sta_set)
+    far.create()
+    problem = LPPFS(far)
+    problem.create_matrix(sparse=True, presolve=True)
+    full_col, col = problem.presolve_report['columns']
+    assert problem.presolve_report['removed_stations'] == [8]
+    assert col == far.adj_matrix.nnz + far.node_num - 1
+    solution = problem.expand_solution(np.ones(col))
+    assert len(solution) == full_col
+    assert solution['x1_5'] == 1 and solution['w8'] == 0
+
+
+def test_dominance():
+    """ dominated types are removed and the optimum stays the same """
+    types = {1: {'limit': 100, 'coverage': 5, 'link_distance': 6, 'cost': 10},
+             2: {'limit': 50, 'coverage': 5, 'link_distance': 6, 'cost': 10},
+             3: {'limit': 100, 'coverage': 5, 'link_distance': 6, 'cost': 10},
+             4: {'limit': 100, 'coverage': 4, 'link_distance': 6, 'cost': 5}}
+    reduced, report = reduce_catalog(types)
+    assert report == {'kept': [1, 4], 'dominated': {2: 1, 3: 1}}
+    assert reduced[2] == types[4]
+
+    net = BSS(gate, obj, sta, types)
+    net.create()
+    dominated = dominated_stations(net)
+    assert dominated[net.s_first:].reshape(4, -1).all(axis=1).tolist() == [
+        False, True, True, False]
+
+    cost = []
+    for presolve in (False, True):
+        problem = MILPOP(net)
+        problem.create_matrix(sparse=True, presolve=presolve,
+                              dominance=presolve)
+        x = src.highs.milp_problem.solve(problem)
+        cost.append(problem.f.ravel() @ x)
+    assert cost[0] == cost[1]
+    assert problem.presolve_report['dominated_stations'] == np.flatnonzero(
+        dominated & useful_nodes(net)).tolist()
+
+    # the model without dominated stations can not be priced again and
+    # has no columns of a placement with them
+    with pytest.raises(ValueError):
+        Model(problem).cost_vector(types)
+    y = np.zeros(net.node_num - net.s_first, dtype=bool)
+    y[problem.presolve_report['dominated_stations'][0] - net.s_first] = True
+    with pytest.raises(ValueError):
+        Placement(net, y, max_flow(net, y)).x(problem)
@@ -0,0 +1,42 @@
+import json
+
+import numpy as np
+
+from src.generator import random_instance
+from src.benchmark import run_benchmark
+
+
+def test_random_instance():
+    """ the same seed gives the same instance, clusters stay in the area """
+    first = random_instance(50, 10, seed=1, clusters=3)
+    second = random_instance(50, 10, seed=1, clusters=3)
+    assert np.array_equal(first['obj']['pos'].data, second['obj']['pos'].data)
+    assert first['sta_type'] == second['sta_type']
+    assert len(first['sta_type']) == 3 and len(first['sta']['pos']) == 10
+    assert np.all((first['obj']['pos'].data >= 0) &
+                  (first['obj']['pos'].data <= 100))
+    other = random_instance(50, 10, seed=2)
+    assert not np.array_equal(first['obj']['pos'].data,
+                              other['obj']['pos'].data)
+
+
+def test_benchmark_report(tmp_path):
+    """ report has the stages and dimensions of every case """
+    path = str(tmp_path / 'bench.json')
+    run_benchmark(sizes=(10, 20), solvers=('highs-ds', 'maxflow',
+                                           'scipy-milp', 'greedy'),
+                  time_limit=10, path=path)
+    with open(path) as file:
+        report = json.load(file)
+    assert [case['objects'] for case in report['cases']] == [10, 20]
+    for case in report['cases']:
+        assert case['create']['error'] is None
+        assert case['create']['peak_memory'] > 0
+        for task, result in case['tasks'].items():
+            assert result['model']['columns'] > 0
+            assert result['solvers']
+            assert all(stats['error'] is None
+                       for stats in result['solvers'].values())
+        milpop = case['tasks']['milpop']['solvers']
+        assert milpop['greedy']['objective'] >= \
+            milpop['scipy-milp']['objective']
@@ -0,0 +1,62 @@
+import numpy as np
+import scipy.sparse as sp
+
+from src.cache import Cache, make_key, get_cache
+from src.profiling import Profiler
+from src.sweep import base_scenario, run_scenario
+from src.task3.milpop import get_milpop_solution
+
+
+def test_cache(tmp_path):
+    """ records come back from memory and disk, old files are evicted """
+    assert make_key({'lim': {1: 30.0}}, (1, 2)) == \
+        make_key({'lim': {1: 30}}, [np.int64(1), 2])
+    assert make_key({'lim': {1: 30}}) != make_key({'lim': {1: 31}})
+
+    record = {'a': sp.random(5, 4, density=0.5, format='csr'),
+              'b': np.arange(3), 'objective': 2.5}
+    cache = Cache(str(tmp_path), memory_size=1)
+    cache.put('k1', record)
+    assert cache.get('k1') is record
+
+    cache.put('k2', {'b': np.ones(2)})
+    loaded = cache.get('k1')
+    assert (loaded['a'] != record['a']).nnz == 0
+    assert np.array_equal(loaded['b'], record['b'])
+    assert loaded['objective'] == 2.5
+    assert cache.get('k3') is None
+    assert cache.hits == {'memory': 1, 'disk': 1} and cache.misses == 1
+
+    cache.disk_size = cache.disk_bytes() - 1
+    cache.evict()
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+def test_cached_scenario(tmp_path):
+    """ the same scenario is solved once, the model is reused """
+    scenario = base_scenario('milppfs', cache=str(tmp_path))
+    first = run_scenario(scenario)
+    second = run_scenario(scenario)
+    assert first['cached'] is None and second['cached'] == 'solution'
+    assert second['placed'] == first['placed']
+
+    changed = run_scenario(dict(scenario, time_limit=100))
+    assert changed['cached'] == 'model'
+    assert changed['objective'] == first['objective']
+
+    lppfs = base_scenario('lppfs', cache=str(tmp_path))
+    run_scenario(lppfs)
+    second = run_scenario(lppfs)
+    assert second['status'] == 'ok' and second['cached'] == 'solution'
+
+
+def test_cached_run(tmp_path):
+    """ the entry point reuses the network edges and the solution """
+    first = get_milpop_solution(solver='highs', cache=str(tmp_path))
+    with Profiler() as profiler:
+        second = get_milpop_solution(solver='highs', cache=str(tmp_path))
+    assert second.equals(first)
+    assert 'solve' not in profiler.stages()
+    get_cache(str(tmp_path)).memory.clear()
+    assert get_milpop_solution(solver='highs',
+                               cache=str(tmp_path)).equals(first)
@@ -0,0 +1,66 @@
+import numpy as np
+
+from problem.lppfs_input import gate, obj, sta
+from src.network import BSS
+from src.task1.lppfs import LPPFS
+from src.lp_problem import solve_lp_problem
+from src.flow import max_flow, FlowNetwork
+
+
+def lppfs(limit):
+    net = BSS(gate, obj, sta, {1: {'limit': limit, 'coverage': 10,
+                                   'link_distance': 10}})
+    net.create()
+    problem = LPPFS(net)
+    problem.create_matrix(sparse=True)
+    return net, problem
+
+
+def test_max_flow():
+    """ max-flow agrees with LP and its flows are an LP solution """
+    for limit in (5, 10, 39, 40, 200):
+        net, problem = lppfs(limit)
+        lp = solve_lp_problem(problem.f, problem.ineq_array, problem.ineq_b,
+                              problem.eq_array, problem.eq_b,
+                              problem.lower_bounds, problem.upper_bounds)
+        result = max_flow(net)
+        assert result.feasible == lp.feasible
+        if result.feasible:
+            x = result.x(problem.variables)
+            assert np.allclose(problem.eq_array @ x, problem.eq_b)
+            assert np.all(problem.ineq_array @ x <= problem.ineq_b)
+        else:
+            # the min-cut is the capacity of all stations
+            assert result.value == 3 * limit
+            assert result.cut == [(5, 5), (6, 6), (7, 7)]
+
+
+def test_max_flow_placed_stations():
+    """ only placed stations carry flow """
+    net, _ = lppfs(20)
+    result = max_flow(net, stations=np.array([False, False, True]))
+    assert result.value == 20 and result.cut == [(7, 7)]
+    assert result.source_side[7] and not result.source_side[0]
+    assert np.all(result.flow[(result.tails != 7) & (result.heads != 7)] == 0)
+
+
+def test_max_flow_empty_placement():
+    """ without stations nothing reaches the gateway """
+    net, _ = lppfs(20)
+    result = max_flow(net, stations=np.zeros(3, dtype=bool))
+    assert result.value == 0 and not result.feasible
+    assert len(result.flow) == len(result.tails) == 0
+
+
+def test_flow_network_reuse():
+    """ one network solves all placements, the same as max_flow """
+    net, _ = lppfs(20)
+    network = FlowNetwork(net)
+    for y in ([True, False, True], [False, True, False], [True] * 3):
+        y = np.array(y)
+        result = network.solve(y)
+        expected = max_flow(net, stations=y)
+        assert result.value == network.value(y) == expected.value
+        assert result.cut == expected.cut
+        assert np.all(result.through[~y] == 0)
+        assert result.through[y].sum() == result.value
@@ -0,0 +1,55 @@
+import json
+
+import numpy as np
+import pytest
+
+from problem import milpop_input
+from src.network import BSS
+from src.task3.milpop import MILPOP
+from src.instance import load_instance, save_instance
+import src.highs.milp_problem
+
+inputs = {'gate': milpop_input.gate, 'obj': milpop_input.obj,
+          'sta': milpop_input.sta, 'sta_type': milpop_input.sta_type}
+net = BSS(inputs['gate'], inputs['obj'], inputs['sta'], inputs['sta_type'])
+net.create()
+
+
+def test_instance_files(tmp_path):
+    """ every format gives the network of the input module """
+    for name in ('instance.json', 'instance.csv', 'instance.npz', 'npy'):
+        path = str(tmp_path / name)
+        save_instance(path, inputs)
+        instance = load_instance(path)
+        loaded = BSS(instance['gate'], instance['obj'], instance['sta'],
+                     instance['sta_type'])
+        loaded.create()
+        assert (loaded.adj_matrix != net.adj_matrix).nnz == 0
+        assert dict(instance['obj']['lim']) == milpop_input.obj['lim']
+    assert isinstance(instance['obj']['pos'].data, np.memmap)
+    assert isinstance(load_instance(str(tmp_path / 'instance.npz'))[
+        'sta']['pos'].data, np.memmap)
+
+    # the gateway is not put at the origin silently
+    path = str(tmp_path / 'instance.json')
+    with open(path) as file:
+        data = json.load(file)
+    del data['gate']['pos']
+    with open(path, 'w') as file:
+        json.dump(data, file)
+    with pytest.raises(ValueError, match='instance.json'):
+        load_instance(path)
+
+
+def test_instance_solution(tmp_path):
+    """ loaded instance has the optimum of the input module """
+    path = str(tmp_path / 'instance.npz')
+    save_instance(path, inputs)
+    optimum = []
+    for network in (net, BSS(*load_instance(path).values())):
+        network.create()
+        problem = MILPOP(network)
+        problem.create_matrix(sparse=True, presolve=True)
+        x = src.highs.milp_problem.solve(problem)
+        optimum.append(problem.f.ravel() @ x)
+    assert optimum[0] == optimum[1]
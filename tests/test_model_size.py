@@ -0,0 +1,52 @@
+import warnings
+
+import pytest
+import scipy.sparse as sp
+
+from problem import milpop_input as data
+from src.network import BSS
+from src.model_size import estimate_size, guard_memory, ModelTooLargeError
+from src.profiling import model_stats
+from src.task1.lppfs import LPPFS
+from src.task2.milppfs import MILPPFS
+from src.task3.milpop import MILPOP
+
+net = BSS(data.gate, data.obj, data.sta, data.sta_type)
+net.create()
+
+
+def test_estimate():
+    """ estimate gives the columns and rows, bounds the nonzeros """
+    for task, problem_class in (('lppfs', LPPFS), ('milppfs', MILPPFS),
+                                ('milpop', MILPOP)):
+        for presolve, tighten in ((False, False), (True, True)):
+            problem = problem_class(net)
+            if task == 'lppfs':
+                problem.create_matrix(sparse=True, presolve=presolve)
+            else:
+                problem.create_matrix(sparse=True, presolve=presolve,
+                                      tighten=tighten)
+            size = estimate_size(net, task, presolve, tighten)
+            stats = model_stats(problem)
+            assert stats['nonzeros'] <= size.nonzeros
+            if not presolve:
+                assert stats['columns'] == size.columns
+                assert stats['rows'] == size.rows
+                assert stats['nonzeros'] == size.nonzeros
+            else:
+                assert stats['columns'] <= size.columns
+
+
+def test_memory_guard():
+    """ dense model over the budget is assembled sparse, tiny one raises """
+    size = estimate_size(net, 'milpop')
+    problem = MILPOP(net)
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        problem.create_matrix(memory_budget=size.sparse_bytes + 1)
+    assert caught and sp.issparse(problem.eq_array)
+    with pytest.raises(ModelTooLargeError):
+        MILPOP(net).create_matrix(sparse=True, memory_budget=1000)
+    # zero budget is a budget, not the default
+    with pytest.raises(ModelTooLargeError):
+        guard_memory(size, sparse=True, budget=0)
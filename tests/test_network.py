@@ -1,5 +1,8 @@
+import pytest
+
 from problem.lppfs_input import gate, obj, sta, sta_set
-from src.network import BSS
+from src.geometry import ArrayMap, as_points
+from src.network import BSS, DisconnectedNetworkError
 
 net = BSS(gate, obj, sta, sta_set)
 net.create()
@@ -9,3 +12,74 @@ def test_adj_mat():
     """ check adj matrix """
     assert net.adj_matrix is not None
 
+
+def test_chunked_edges():
+    """ tiled distance search gives the same edges """
+    chunked = BSS(gate, obj, sta, sta_set)
+    chunked.create(chunk_size=2)
+    assert set(chunked.G.edges()) == set(net.G.edges())
+
+
+def test_spatial_index_edges():
+    """ kdtree and grid search give the same edges as all pairs search """
+    for method in ('kdtree', 'grid'):
+        indexed = BSS(gate, obj, sta, sta_set)
+        indexed.create(method=method)
+        assert set(indexed.G.edges()) == set(net.G.edges())
+
+
+def test_neighbors():
+    """ CSR/CSC neighbors agree with networkx graph """
+    for i in range(net.node_num):
+        assert set(net.out_neighbors(i)) == set(net.G.successors(i))
+        assert set(net.in_neighbors(i)) == set(net.G.predecessors(i))
+
+
+def test_unreachable_objects():
+    """ all objects far from stations are reported """
+    far_obj = {'pos': {**obj['pos'], 5: (100, 100), 6: (-50, 0)},
+               'lim': {**obj['lim'], 5: 10, 6: 10}}
+    far = BSS(gate, far_obj, sta, sta_set)
+    with pytest.raises(DisconnectedNetworkError) as error:
+        far.create()
+    assert error.value.unreachable == [5, 6]
+
+    far = BSS(gate, far_obj, sta, sta_set)
+    far.create(check=False)
+    report = far.reachability
+    assert not report['connected']
+    assert report['unreachable'] == [5, 6]
+
+
+def test_incremental_update():
+    """ network after add and remove of a place equals the rebuilt one """
+    changed = BSS(gate, obj, sta, sta_set)
+    changed.create()
+    delta = changed.add_site((6, 5))
+    new_sta = {'pos': {**sta['pos'], 4: (6, 5)}}
+    rebuilt = BSS(gate, obj, new_sta, sta_set)
+    rebuilt.create()
+    assert set(changed.G.edges()) == set(rebuilt.G.edges())
+    assert all(changed.adj_matrix[t, h] for t, h in zip(*delta['added']))
+
+    delta = changed.remove_site(4)
+    assert set(changed.G.edges()) == set(net.G.edges())
+    assert len(delta['removed'][0]) == len(rebuilt.G.edges()) - len(
+        net.G.edges())
+    with pytest.raises(KeyError):
+        changed.move_object(99, (1, 1))
+    with pytest.raises(KeyError):
+        changed.remove_site(99)
+    with pytest.raises(ValueError):
+        changed.add_station_type(dict(sta_set[1]), key=1)
+
+    # positions of a loaded instance stay arrays
+    mapped = BSS(gate, obj, {'pos': ArrayMap(*as_points(sta['pos']))},
+                 sta_set)
+    mapped.create()
+    mapped.add_site((6, 5))
+    assert isinstance(mapped.sta_pos, ArrayMap)
+    assert set(mapped.G.edges()) == set(rebuilt.G.edges())
+    mapped.remove_site(4)
+    assert isinstance(mapped.sta_pos, ArrayMap)
+    assert set(mapped.G.edges()) == set(net.G.edges())
@@ -0,0 +1,40 @@
+import json
+
+from src.profiling import Profiler, span, record
+from src.task3.milpop import get_milpop_solution
+
+
+def test_profiler(tmp_path):
+    """ stages of a run are timed with model statistics and profiles """
+    with Profiler(cprofile=True, memory=True) as profiler:
+        get_milpop_solution(solver='highs')
+    stages = profiler.stages()
+    for name in ('draw_input_data', 'BSS.create', 'create_matrix',
+                 'create_matrix/make_equality', 'get_solution_col_name',
+                 'solve', 'draw_milp_graph'):
+        assert name in stages
+    run = profiler.report()['run']
+    assert sum(stages[child['name']] for child in run['children']) <= \
+        run['wall_time']
+    matrix = [child for child in run['children']
+              if child['name'] == 'create_matrix'][0]
+    assert matrix['stats']['columns'] > 0
+    assert matrix['stats']['integers'] > 0
+    assert matrix['peak_memory'] > 0 and matrix['profile']
+
+    path = str(tmp_path / 'run.json')
+    profiler.save(path)
+    with open(path) as file:
+        assert json.load(file)['run']['name'] == 'run'
+
+
+def test_disabled():
+    """ without a profiler spans and records do nothing """
+    def fail():
+        raise AssertionError('statistics are computed without a profiler')
+
+    with span('stage'):
+        record(fail, rows=1)
+    with Profiler() as profiler:
+        pass
+    assert profiler.stages() == {}
@@ -0,0 +1,205 @@
+import time
+
+import numpy as np
+import pytest
+
+from problem.milppfs_input import gate, obj, sta, sta_set
+from problem import milpop_input
+from src.network import BSS
+from src.task1.lppfs import LPPFS
+from src.task2.milppfs import MILPPFS
+from src.task3.milpop import MILPOP, relaxation_gap
+from src.lp_problem import solve_lp_problem
+import src.highs.milp_problem
+from src.highs.model import Model
+from src.task3.greedy import greedy_placement
+from src.task3.local_search import local_search, parallel_search
+from src.options import SolveOptions
+
+net = BSS(gate, obj, sta, sta_set)
+net.create()
+
+
+def test_highs_feasible_solution():
+    """ HiGHS places one station of every type """
+    problem = MILPPFS(net)
+    problem.create_matrix(sparse=True, presolve=True)
+    x = src.highs.milp_problem.solve(problem, option='feasible_solution')
+    y = x[problem._y_index]
+    assert np.array_equal(y, np.round(y))
+    assert y.sum() == len(sta_set)
+
+    # the far site carries no flow but is the only place of the second type
+    types = {t: {'limit': 100, 'coverage': 5, 'link_distance': 10}
+             for t in (1, 2)}
+    small = BSS({'pos': {0: (5, 0)}, 'lim': {0: float('inf')}},
+                {'pos': {1: (0, 1)}, 'lim': {1: 10}},
+                {'pos': {1: (0, 0), 2: (100, 100)}}, types)
+    small.create(check=False)
+    for presolve in (False, True):
+        problem = MILPPFS(small)
+        problem.create_matrix(sparse=True, presolve=presolve)
+        x = src.highs.milp_problem.solve(problem, option='feasible_solution')
+        assert x[problem._y_index].sum() == 2
+
+
+def test_lp_result():
+    """ LP returns status instead of asserting """
+    problem = LPPFS(net)
+    problem.create_matrix(sparse=True, presolve=True)
+    args = (problem.f, problem.ineq_array, problem.ineq_b,
+            problem.eq_array, problem.eq_b,
+            problem.lower_bounds, problem.upper_bounds)
+    for method in ('highs-ds', 'highs-ipm'):
+        result = solve_lp_problem(*args, method=method)
+        assert result.feasible
+        assert len(result.x) == len(problem.variables)
+        assert len(result.duals['eqlin']) == len(problem.eq_b)
+
+    problem.eq_b = problem.eq_b * 100
+    result = solve_lp_problem(*args[:4], problem.eq_b, *args[5:])
+    assert result.success and not result.feasible
+
+
+def milpop(types, lim):
+    problem = MILPOP(BSS(gate, {**obj, 'lim': lim}, sta, types))
+    problem.net.create()
+    problem.create_matrix(sparse=True, presolve=True)
+    return problem
+
+
+def test_warm_model():
+    """ changed costs and demands give the optimum of the rebuilt model """
+    types = {t: dict(v, cost=10 * t) for t, v in sta_set.items()}
+    model = Model(milpop(types, obj['lim']))
+    cold = model.solve()
+    assert cold.success and not cold.warm and cold.objective == 20
+
+    types[2]['cost'] = 100
+    lim = {o: 30 for o in obj['lim']}
+    model.set_objective(model.cost_vector(types))
+    model.set_rhs(eq_b=model.demand_rhs(lim))
+    warm = model.solve()
+    assert warm.warm and warm.saved is not None
+
+    problem = milpop(types, lim)
+    x = src.highs.milp_problem.solve(problem)
+    assert warm.objective == problem.f.ravel() @ x
+
+
+def test_solve_demands():
+    """ batch of demand vectors gives the optima of the rebuilt models """
+    types = {t: dict(v, cost=10 * t) for t, v in sta_set.items()}
+    model = Model(milpop(types, obj['lim']))
+    demands = np.array([[10, 10, 10, 10], [30, 30, 30, 30], [90, 10, 0, 0]])
+    batch = model.solve_demands(demands)
+    for k, demand in enumerate(demands):
+        problem = milpop(types, dict(zip(obj['pos'], demand.tolist())))
+        x = src.highs.milp_problem.solve(problem)
+        assert batch.objective[k] == problem.f.ravel() @ x
+        assert batch.placed[k].sum() == x[problem._y_index].sum()
+
+    # bounds of a tightened model hold for its own demand only
+    problem = MILPOP(BSS(gate, obj, sta, types))
+    problem.net.create()
+    problem.create_matrix(sparse=True, presolve=True, tighten=True)
+    with pytest.raises(ValueError):
+        Model(problem).solve_demands(demands)
+
+
+def test_greedy_placement():
+    """ greedy placement is a feasible solution of MILPOP """
+    types = {t: dict(v, cost=10 * t) for t, v in sta_set.items()}
+    problem = milpop(types, {o: 30 for o in obj['lim']})
+    placement = greedy_placement(problem.net)
+    assert placement.feasible
+    sites = (placement.nodes - problem.net.s_first) % problem.net.site_num
+    assert len(set(sites.tolist())) == len(sites)
+
+    x = placement.x(problem)
+    assert np.allclose(problem.eq_array @ x, problem.eq_b)
+    assert np.all(problem.ineq_array @ x <= problem.ineq_b + 1e-9)
+    assert placement.cost == problem.f.ravel() @ x
+
+    model = Model(problem)
+    model.set_start(x)
+    result = model.solve()
+    assert result.warm and result.objective <= placement.cost
+
+    # one station serves the object, the clean up tries no station at all
+    single = BSS({'pos': {0: (5, 0)}, 'lim': {0: float('inf')}},
+                 {'pos': {1: (0, 1)}, 'lim': {1: 10}},
+                 {'pos': {1: (0, 0)}},
+                 {1: {'limit': 100, 'coverage': 5, 'link_distance': 10,
+                      'cost': 10}})
+    single.create()
+    placement = greedy_placement(single)
+    assert placement.feasible and placement.nodes.tolist() == [2]
+    found = list(local_search(single, 1, seed=0, max_iter=20))
+    assert all(placement.feasible for placement in found)
+
+
+def test_local_search():
+    """ improving placements are feasible and cheaper one by one """
+    types = {t: dict(v, cost=10 * t) for t, v in sta_set.items()}
+    problem = milpop(types, {o: 30 for o in obj['lim']})
+    x = src.highs.milp_problem.solve(problem)
+    optimum = problem.f.ravel() @ x
+
+    found = list(local_search(problem.net, 10, seed=0, max_iter=300))
+    costs = [placement.cost for placement in found]
+    assert all(placement.feasible for placement in found)
+    assert costs == sorted(set(costs), reverse=True)
+    assert costs[-1] >= optimum
+
+    found = list(parallel_search(problem.net, 10, seeds=(1, 2),
+                                 max_iter=100))
+    assert found and found[-1][1].feasible
+    assert found[-1][0] in (1, 2)
+
+    # the greedy start is a part of the budget
+    start = time.monotonic()
+    found = list(local_search(problem.net, 0, seed=0))
+    found += [placement for _, placement in
+              parallel_search(problem.net, 0, seeds=(1,))]
+    assert all(placement.feasible for placement in found)
+    assert time.monotonic() - start < 30
+
+
+def test_tighten():
+    """ tightened model has finite bounds, the same optimum, no more gap """
+    types = {t: dict(v, cost=10 * t) for t, v in sta_set.items()}
+    problem = milpop(types, {o: 30 for o in obj['lim']})
+    report = relaxation_gap(problem.net)
+    assert report['gap'][1] <= report['gap'][0]
+    assert report['optimum'] == (problem.f.ravel() @
+                                 src.highs.milp_problem.solve(problem))
+
+    problem = MILPPFS(net)
+    problem.create_matrix(sparse=True, presolve=True, tighten=True)
+    x = problem.variables.block('x')
+    assert np.isfinite(problem.upper_bounds[0, x]).all()
+    src.highs.milp_problem.solve(problem, option='feasible_solution')
+
+
+def test_solve_options():
+    """ callback streams improving incumbents and stops the solver """
+    types = {t: dict(v, cost=10 * t) for t, v in sta_set.items()}
+    problem = milpop(types, {o: 30 for o in obj['lim']})
+    found = []
+    options = SolveOptions(time_limit=60, mip_rel_gap=0,
+                           callback=found.append)
+    x = src.highs.milp_problem.solve(problem, options=options)
+    objectives = [incumbent['objective'] for incumbent in found]
+    assert objectives == sorted(objectives, reverse=True)
+    assert objectives[-1] == problem.f.ravel() @ x
+    assert all(incumbent['bound'] <= incumbent['objective'] + 1e-9
+               for incumbent in found)
+
+    problem = MILPOP(BSS(milpop_input.gate, milpop_input.obj,
+                         milpop_input.sta, milpop_input.sta_type))
+    problem.net.create()
+    problem.create_matrix(sparse=True, presolve=True)
+    result = Model(problem).solve(options=SolveOptions(
+        callback=lambda incumbent: True))
+    assert result.status == 'kInterrupt' and result.x is not None
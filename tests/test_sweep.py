@@ -0,0 +1,43 @@
+import time
+
+from src.generator import random_instance
+from src.sweep import sweep, base_scenario
+
+
+def scenarios():
+    yield base_scenario('lppfs', name='lp')
+    for k in (1, 2):
+        scenario = base_scenario('milppfs', name='demand{}'.format(k))
+        scenario['obj']['lim'] = {o: 10 * k for o in scenario['obj']['lim']}
+        yield scenario
+    yield base_scenario('lppfs', name='no_station', sta={'pos': {}})
+
+
+def test_sweep():
+    """ every scenario has a result, failed scenario does not stop others """
+    results = {r['name']: r for r in sweep(scenarios(), workers=2)}
+    assert sorted(r['index'] for r in results.values()) == [0, 1, 2, 3]
+    assert results['lp']['status'] == 'ok'
+    assert results['demand2']['status'] == 'ok'
+    assert len(results['demand2']['placed']) == 2
+    assert results['no_station']['status'] == 'error'
+
+
+def test_sweep_timeout():
+    """ a long MILP is reported as timeout and frees its worker """
+    # solves for many minutes without a time limit
+    slow = dict(random_instance(300, 75, seed=0), task='milpop', name='slow')
+    start = time.monotonic()
+    results = {r['name']: r for r in sweep([slow, base_scenario('lppfs')],
+                                           workers=1, timeout=3)}
+    assert results['slow']['status'] == 'timeout'
+    assert results['lppfs']['status'] == 'ok'
+    assert time.monotonic() - start < 60
+
+    # the worker stays busy after the deadline, the next scenario waits
+    # for it and its deadline starts when it runs
+    results = {r['name']: r for r in sweep([dict(slow, time_limit=6),
+                                            base_scenario('lppfs')],
+                                           workers=1, timeout=2)}
+    assert results['slow']['status'] == 'timeout'
+    assert results['lppfs']['status'] == 'ok'
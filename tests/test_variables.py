@@ -0,0 +1,35 @@
+import numpy as np
+
+from problem.milppfs_input import gate, obj, sta, sta_set
+from src.network import BSS
+from src.task1.lppfs import LPPFS
+from src.variables import VariableIndex
+
+
+def test_variable_columns():
+    """ columns of arc and node blocks are found by keys """
+    variables = VariableIndex(10)
+    variables.add_arcs('x', [1, 2, 5], [5, 5, 0])
+    variables.add_nodes('y', [5, 6])
+    assert len(variables) == 5
+    assert variables.columns('x', [5, 1, 2], [0, 5, 4]).tolist() == [2, 0, -1]
+    assert variables.columns('y', [6, 5]).tolist() == [4, 3]
+    assert variables.index('x', 2, 5) == 1
+    assert variables.index('y', 6) == 4
+    assert variables.names() == ['x1_5', 'x2_5', 'x5_0', 'y5', 'y6']
+
+
+def test_many_nodes():
+    """ x names of networks with more than 9 nodes """
+    net = BSS(gate, obj, sta, sta_set)
+    net.create()
+    assert net.node_num > 10
+    problem = LPPFS(net)
+    problem.create_matrix()
+    s_num = len(net.s_p)
+    x_num = (len(net.o_p) * s_num + s_num * (s_num - 1) +
+             s_num * len(net.g_p))
+    names = problem.variables.names('x')
+    assert len(names) == len(set(names)) == x_num
+    assert 'x10_0' in names
+    assert np.array_equal(problem.f[0, x_num:], np.ones(net.node_num))